@@ -0,0 +1,169 @@
+"""
+Headless scaling benchmark for both dashboards.
+
+    python -m benchmarks.run --scales 10 100 1000 --output benchmark_report.json
+    python -m benchmarks.run --baseline old_report.json   # exits 1 on a regression
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+# Time the parser itself rather than the Arrow sidecar copies of earlier runs
+os.environ["AOP_SIDECAR_DIR"] = ""
+
+import pandas as pd
+
+from benchmarks.synthetic import make_expense, make_target, scaled_sizes
+from utils.aop_engine import (
+    METRICS, cash_flow, inflow_distribution, monthly_breakdown, performance_summary, portfolio_comparison
+)
+from utils.as_of import PERIODS
+from utils.cache import derived_cache
+from utils.helper import compute_monthly_html_table, plot_fy_metric, plot_inflow_by_project
+from utils.html_table import flat_table, period_table
+from utils.load_data import parse_cache, prepared_cache, read_file
+from utils.normalize import prepare_expense, prepare_target
+
+class Upload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile: bytes plus a file name."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def clear_caches():
+    for cache in [parse_cache, prepared_cache, derived_cache]:
+        cache.clear()
+
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        clear_caches()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, {"min_s": min(times), "median_s": statistics.median(times), "runs": times}
+
+
+def aggregate(target_df, expense_df, last_month):
+    """Everything both dashboards show for the portfolio, through the engine."""
+    return {
+        "summary": performance_summary(target_df, last_month),
+        "portfolio": portfolio_comparison(target_df, last_month),
+        "monthly": monthly_breakdown(target_df, last_month),
+        "inflow": inflow_distribution(target_df, last_month),
+        # Cash flow table with every expense head expanded
+        "cash_flow": cash_flow(expense_df, target_df, last_month, show_details=True),
+    }
+
+
+def html_output(results):
+    monthly = results["monthly"].monthly
+    tables = [compute_monthly_html_table(monthly, metric, t_col, a_col) for metric, t_col, a_col in METRICS]
+    tables.append(period_table(results["summary"].frame, "Metric", PERIODS, "aop-table"))
+    groups = [metric for metric, _, _ in METRICS]
+    tables.append(period_table(results["portfolio"].frame, "Project", groups, "aop-table"))
+    tables.append(flat_table(results["inflow"].with_total(), "Project", "inflow-table"))
+    tables.append(period_table(results["cash_flow"].frame, "Expenses", PERIODS, "exp-table"))
+    return tables
+
+
+def figure_output(results):
+    monthly = results["monthly"].monthly
+    figures = [plot_fy_metric(monthly, metric, t_col, a_col) for metric, t_col, a_col in METRICS]
+    figures.append(plot_inflow_by_project(results["inflow"].frame))
+    # Serialising is what st.plotly_chart does with every figure
+    return [fig.to_json() for fig in figures]
+
+
+def bench_scale(scale, repeats):
+    sizes = scaled_sizes(scale)
+    target_bytes = make_target(sizes["projects"], sizes["years"]).to_csv(index=False).encode()
+    expense_bytes = make_expense(sizes["heads"], sizes["years"]).to_csv(index=False).encode()
+
+    stages = {}
+    (target_raw, expense_raw), stages["read_file"] = timed(
+        lambda: (read_file(Upload(target_bytes, "target.csv")), read_file(Upload(expense_bytes, "expense.csv"))),
+        repeats
+    )
+    (target_df, expense_df), stages["normalize"] = timed(
+        lambda: (prepare_target(target_raw), prepare_expense(expense_raw)), repeats
+    )
+
+    last_month = target_df["monthstart"].max()
+
+    aggregates, stages["period_aggregates"] = timed(lambda: aggregate(target_df, expense_df, last_month), repeats)
+    tables, stages["html_tables"] = timed(lambda: html_output(aggregates), repeats)
+    figures, stages["figures"] = timed(lambda: figure_output(aggregates), repeats)
+
+    return {
+        "scale": scale,
+        **sizes,
+        "target_rows": len(target_df),
+        "expense_rows": len(expense_df),
+        "upload_bytes": len(target_bytes) + len(expense_bytes),
+        "html_bytes": sum(len(table) for table in tables),
+        "figure_bytes": sum(len(fig) for fig in figures),
+        "stages": stages,
+    }
+
+
+def find_regressions(report, baseline, tolerance):
+    """Stages whose median is more than `tolerance` (a fraction) slower than in `baseline`."""
+    previous = {result["scale"]: result["stages"] for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        for stage, timing in result["stages"].items():
+            before = previous.get(result["scale"], {}).get(stage)
+            if before and timing["median_s"] > before["median_s"] * (1 + tolerance):
+                regressions.append(
+                    f"{stage} at {result['scale']}x: {before['median_s']:.4f}s -> {timing['median_s']:.4f}s"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time ingestion, normalization, aggregation and rendering at scale.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "repeats": args.repeats,
+        "results": [],
+    }
+    for scale in args.scales:
+        result = bench_scale(scale, args.repeats)
+        report["results"].append(result)
+        timings = ", ".join(f"{stage} {timing['median_s']:.3f}s" for stage, timing in result["stages"].items())
+        print(f"{scale}x ({result['target_rows']:,} target / {result['expense_rows']:,} expense rows): {timings}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"Regression: {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Synthetic target/expense uploads in the dashboards' schemas.
+
+    python -m benchmarks.synthetic --projects 40 --years 5 --heads 18 --output-dir data/synthetic
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.helper import valid_months
+
+# Shape of data/target_data.csv (4 projects x 5 years) and of a 9-head expense upload
+SAMPLE_PROJECTS = 4
+SAMPLE_YEARS = 5
+SAMPLE_HEADS = 9
+
+BASE_HEADS = [
+    ("Salary", "Employee Costs"),
+    ("Legal and Professional", "Administrative"),
+    ("Rent", "Administrative"),
+    ("Hotel & Travel Expenses", "Administrative"),
+    ("Marketing Exp.", "Marketing"),
+    ("Misc Expenses", "Administrative"),
+    ("Investments (Trilive / TTG / Misc)", "Investments"),
+    ("Capex", "Investments"),
+    ("Other Outflows", "Other"),
+]
+
+
+def project_names(n):
+    width = len(str(n))
+    return [f"Project {i + 1:0{width}d}" for i in range(n)]
+
+
+def expense_heads(n):
+    """The sample's heads first, then numbered variants of them in the same categories."""
+    heads = []
+    for i in range(n):
+        name, category = BASE_HEADS[i % len(BASE_HEADS)]
+        round_no = i // len(BASE_HEADS)
+        heads.append((name if round_no == 0 else f"{name} {round_no + 1}", category))
+    return heads
+
+
+def make_target(projects, years, start_year=2020, seed=0):
+    """One row per project and month, with the columns and value ranges of data/target_data.csv."""
+    rng = np.random.default_rng(seed)
+    n = projects * years * 12
+    collection_target = rng.integers(600, 1190, n)
+    collection_achieved = np.round(collection_target * rng.uniform(0.8, 1.0, n), 2)
+    return pd.DataFrame({
+        "Project": np.repeat(project_names(projects), years * 12),
+        "Year": np.tile(np.repeat(np.arange(start_year, start_year + years), 12), projects),
+        "Month": np.tile(valid_months, projects * years),
+        "Collection Target": collection_target,
+        "Collection Achieved": collection_achieved,
+        "Sales value Target": np.round(rng.uniform(570, 1370, n), 2),
+        "Actual Sales value": np.round(rng.uniform(350, 1250, n), 2),
+        "Target sales Unit": rng.integers(1, 10, n),
+        "Actual sales Unit": rng.integers(1, 10, n),
+        "DM Inflow target": np.round(collection_target * 0.1, 2),
+        "DM Inflow actual": np.round(collection_achieved * 0.1, 3),
+    })
+
+
+def make_expense(heads, years, start_year=2020, seed=0):
+    """One row per expense head and month, in the columns prepare_expense expects."""
+    rng = np.random.default_rng(seed + 1)
+    names, categories = zip(*expense_heads(heads))
+    per_head = years * 12
+    n = heads * per_head
+    return pd.DataFrame({
+        "Expense Category": np.repeat(categories, per_head),
+        "Expense": np.repeat(names, per_head),
+        "Month": np.tile(valid_months, heads * years),
+        "Year": np.tile(np.repeat(np.arange(start_year, start_year + years), 12), heads),
+        "Actual": np.round(rng.uniform(10, 200, n), 2),
+        "Target": np.round(rng.uniform(10, 200, n), 2),
+    })
+
+
+def scaled_sizes(scale):
+    """
+    Projects, years and heads giving `scale` times the sample's row counts: target
+    rows grow with the project count, expense rows with the number of heads.
+    """
+    return {
+        "projects": SAMPLE_PROJECTS * scale,
+        "years": SAMPLE_YEARS,
+        "heads": max(1, round(SAMPLE_HEADS * scale / SAMPLE_YEARS)),
+    }
+
+
+def write_frame(df, path):
+    if path.suffix == ".csv":
+        df.to_csv(path, index=False)
+    elif path.suffix == ".xlsx":
+        df.to_excel(path, index=False)
+    elif path.suffix == ".parquet":
+        df.to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Unsupported output format: {path.suffix}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic target and expense files.")
+    parser.add_argument("--projects", type=int, default=SAMPLE_PROJECTS)
+    parser.add_argument("--years", type=int, default=SAMPLE_YEARS)
+    parser.add_argument("--heads", type=int, default=SAMPLE_HEADS)
+    parser.add_argument("--start-year", type=int, default=2020)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["csv", "xlsx", "parquet"], default="csv")
+    parser.add_argument("--output-dir", type=Path, default=Path("data/synthetic"))
+    args = parser.parse_args(argv)
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    target = make_target(args.projects, args.years, args.start_year, args.seed)
+    expense = make_expense(args.heads, args.years, args.start_year, args.seed)
+    for name, df in [("target_data", target), ("expense_data", expense)]:
+        path = args.output_dir / f"{name}.{args.format}"
+        write_frame(df, path)
+        print(f"Wrote {len(df):,} rows to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,23 @@
 import streamlit as st
 import pandas as pd
 import os
+import sqlite3
 import sys
 from pathlib import Path
 from components.exp_dashboard import render_exp_dashboard
 from components.target_dashboard import render_target_dashboard
-from utils.load_data import render_svg,read_file
+from utils.load_data import render_svg,load_target,load_expense,parse_cache,prepared_cache,SUPPORTED_TYPES
+from utils.grid import html_tables
+from utils.html_table import emit_table_css
+from utils import diagnostics, history_store
+from utils.figure_cache import figure_cache
+import metrics_service
+
+# Keys of every widget inside the dashboard tabs
+TAB_WIDGET_KEYS = [
+    "target_project", "ytd_trend", "long_trend", "long_trend_months", "long_trend_metric",
+    "expense_project", "expense_details",
+]
 
 #This is for logo --------------------------------------------------------------------------------------------
 st.set_page_config(page_title="Tribeca AOP Dashboard", layout="wide", page_icon='assets/logo.webp')
@@ -26,30 +38,120 @@ st.title("AOP Dashboard")
 
 # --- Sidebar File Uploads ------------------------------------------------------------------------------------
 st.sidebar.header("📁 Upload Your Data")
-target_file = st.sidebar.file_uploader("Upload Target File (CSV or Excel)", type=["csv", "xlsx", "xls"])
-expense_file = st.sidebar.file_uploader("Upload Expense File (CSV or Excel)", type=["csv", "xlsx", "xls"])
+# Several files (e.g. one per project) and every sheet of a workbook are combined into one dataset
+target_file = st.sidebar.file_uploader("Upload Target Files (CSV, Excel, Parquet or Feather)", type=SUPPORTED_TYPES, accept_multiple_files=True)
+expense_file = st.sidebar.file_uploader("Upload Expense Files (CSV, Excel, Parquet or Feather)", type=SUPPORTED_TYPES, accept_multiple_files=True)
 today = pd.to_datetime(st.sidebar.date_input("📅 Select Today's Date", value=pd.to_datetime("today")))
+# Per-stage timings for this rerun; AOP_DIAGNOSTICS=1 turns the toggle on by default
+run_diagnostics = diagnostics.start_run(
+    st.sidebar.toggle("🩺 Diagnostics", value=diagnostics.default_enabled(), key="diagnostics")
+)
 #--------------------------------------------------------------------------------------------------------------
 
 
 # --- Tabs ----------------------------------------------------------------------------------------------------
 # --- Tabs ----------------------------------------------------------------------------------------------------
-if target_file and expense_file:
+# With a history store (AOP_HISTORY_DB) an upload only needs the new months; the rest comes from the store
+use_history = history_store.store_path() is not None
+if use_history:
     try:
-        target_df = read_file(target_file)
-        expense_df = read_file(expense_file)
+        have_data = (target_file or history_store.has_rows("target")) and (expense_file or history_store.has_rows("expense"))
+    except sqlite3.Error as e:
+        st.error(f"History store {history_store.store_path()} could not be opened: {e}")
+        diagnostics.finish_run(run_diagnostics)
+        st.stop()
+else:
+    have_data = target_file and expense_file
+
+if have_data:
+    try:
+        with diagnostics.stage("load target"):
+            target_df = load_target(target_file) if target_file else None
+        with diagnostics.stage("load expense"):
+            expense_df = load_expense(expense_file) if expense_file else None
+        # Files or sheets that failed are skipped and listed, rather than aborting the upload
+        source_errors = [
+            (label, source, error)
+            for label, df in [("Target", target_df), ("Expense", expense_df)] if df is not None
+            for source, error in df.attrs.get("source_errors", [])
+        ]
+        if use_history:
+            with diagnostics.stage("history store"):
+                target_df, expense_df, changes = history_store.sync(target_df, expense_df)
+            for kind, rows in changes.items():
+                st.sidebar.caption(f"History store: {rows:,} {kind} month rows added or changed")
+    except ValueError as e:
+        st.error(str(e))
+        diagnostics.finish_run(run_diagnostics)
+        st.stop()
     except Exception as e:
         st.error(f"Error reading uploaded files: {e}")
+        diagnostics.finish_run(run_diagnostics)
         st.stop()
 
+    for label, source, error in source_errors:
+        st.sidebar.warning(f"{label} source skipped – {source}: {error}")
+
+    # Optional local JSON/Arrow service over the latest upload, sharing this process's caches
+    metrics_port = metrics_service.port_from_env()
+    if metrics_port:
+        try:
+            metrics_service.start(metrics_port)
+            metrics_service.publish(target_df, expense_df)
+            st.sidebar.caption(f"Metrics service: http://{metrics_service.DEFAULT_HOST}:{metrics_port}/summary")
+        except OSError as e:
+            st.sidebar.warning(f"Metrics service could not start on port {metrics_port}: {e}")
+
+    for cache_name, cache in [("Parse", parse_cache), ("Prepared", prepared_cache)]:
+        stats = cache.stats()
+        st.sidebar.caption(
+            f"{cache_name} cache: {stats['hits']} hits / {stats['misses']} misses · "
+            f"{stats['bytes'] / 2**20:,.1f} of {stats['max_bytes'] / 2**20:,.0f} MB"
+        )
+    for label, df in [("Target", target_df), ("Expense", expense_df)]:
+        memory = df.attrs.get("memory_bytes")
+        if memory:
+            st.sidebar.caption(
+                f"{label} data: {memory['before'] / 2**20:,.2f} MB as uploaded → "
+                f"{memory['after'] / 2**20:,.2f} MB compacted"
+            )
+
     # --- Tabs for views ---
-    tab1, tab2 = st.tabs(["Target Dashboard", "Expense Dashboard"])
+    # Lazy tabs rerun on switch and only compute the open one; AOP_LAZY_TABS=0 renders both
+    lazy_tabs = os.environ.get("AOP_LAZY_TABS", "1") != "0"
+    # Widgets in a hidden tab aren't rendered, so re-assign them all to keep their state
+    for key in TAB_WIDGET_KEYS:
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+
+    # Shared styles for every HTML table on the page, sent once rather than with each table
+    if html_tables():
+        emit_table_css()
+
+    tab1, tab2 = st.tabs(
+        ["Target Dashboard", "Expense Dashboard"],
+        key="active_tab",
+        on_change="rerun" if lazy_tabs else "ignore"
+    )
 
     with tab1:
-        render_target_dashboard(target_df, expense_df, today)
+        if tab1.open is not False:
+            with diagnostics.stage("target dashboard"):
+                render_target_dashboard(target_df, expense_df, today)
 
     with tab2:
-        render_exp_dashboard(expense_df, target_df, today)
+        if tab2.open is not False:
+            with diagnostics.stage("expense dashboard"):
+                render_exp_dashboard(expense_df, target_df, today)
+
+    stats = figure_cache.stats()
+    st.sidebar.caption(
+        f"Figure cache: {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%}) · "
+        f"{stats['bytes'] / 2**20:,.1f} of {stats['max_bytes'] / 2**20:,.0f} MB"
+    )
+
+    diagnostics.finish_run(run_diagnostics)
 
 else:
     st.warning("Please upload both Target and Expense files.")
+    diagnostics.finish_run(run_diagnostics)
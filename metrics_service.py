@@ -0,0 +1,312 @@
+"""
+Read-only local HTTP service for the numbers the dashboards show, as JSON or Arrow IPC.
+
+Standalone, over files or the history store (AOP_HISTORY_DB):
+
+    python metrics_service.py --target data/target.csv --expense data/expense.csv --port 8502
+
+Inside the app, AOP_METRICS_PORT starts the same service on a background thread that
+serves the most recent upload and shares the app's in-process caches.
+
+    GET /health
+    GET /projects
+    GET /summary?project=A&as_of=2025-07&period=YTD
+    GET /portfolio?as_of=2025-07
+    GET /monthly?project=A&as_of=2025-07
+    GET /cash-flow?as_of=2025-07&details=1
+
+Every endpoint takes format=json (default) or format=arrow; an Accept header of
+application/vnd.apache.arrow.stream also selects Arrow.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from utils.aop_engine import (
+    METRICS, cash_flow, month_end, monthly_breakdown, performance_summary, portfolio_comparison, project_names
+)
+from utils.as_of import PERIODS
+from utils.cache import LRUCache, budget_from_env, content_hash, frame_token
+from utils.helper import get_last_completed_month
+from utils import history_store
+from utils.load_data import load_paths
+from utils.summary_cube import ALL_PROJECTS
+
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+DEFAULT_HOST = "127.0.0.1"
+# Periods reach up to a year either side of as_of, and the engine works in nanosecond timestamps
+AS_OF_RANGE = (pd.Timestamp.min + pd.DateOffset(years=1), pd.Timestamp.max - pd.DateOffset(years=1))
+
+# Encoded response bodies keyed by (dataset, path, format, query); a new upload gets a new dataset key
+response_cache = LRUCache(budget_from_env("AOP_METRICS_CACHE_MB", 32))
+
+# The frames being served; replaced as a whole by publish()
+_dataset = {"target": None, "expense": None, "key": None}
+_server_lock = threading.Lock()
+_server = None
+
+
+class BadRequest(ValueError):
+    status = 400
+
+
+class NotFound(ValueError):
+    status = 404
+
+
+def port_from_env():
+    """Port for the in-app service from AOP_METRICS_PORT; unset, empty or 0 leaves it off."""
+    try:
+        return int(os.environ.get("AOP_METRICS_PORT", "") or 0)
+    except ValueError:
+        return 0
+
+
+def dataset_key(target_df, expense_df):
+    tokens = []
+    for df in [target_df, expense_df]:
+        token = frame_token(df)
+        if token is None:
+            token = content_hash(pd.util.hash_pandas_object(df).values.tobytes())
+        tokens.append(token)
+    return content_hash(":".join(tokens).encode())
+
+
+def publish(target_df, expense_df):
+    """Makes these canonical frames the ones served; the same upload again is a no-op."""
+    key = dataset_key(target_df, expense_df)
+    if key != _dataset["key"]:
+        _dataset.update(target=target_df, expense=expense_df, key=key)
+
+
+def start(port, host=DEFAULT_HOST):
+    """Starts the service on a daemon thread once per process; later calls return the running server."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-service", daemon=True).start()
+        return _server
+
+
+def period_rows(frame, groups, label):
+    """Long rows (label, group, target, achieved, delta) from a frame with "<group> Target"-style columns."""
+    parts = []
+    for group in groups:
+        parts.append(pd.DataFrame({
+            label: frame.index.astype(str),
+            "group": group,
+            "target": frame[f"{group} Target"].to_numpy(dtype="float64"),
+            "achieved": frame[f"{group} Achieved"].to_numpy(dtype="float64"),
+            "delta": frame[f"{group} Delta"].to_numpy(dtype="float64"),
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+
+def query_value(query, name, default=None):
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+def as_of_param(query):
+    value = query_value(query, "as_of")
+    if value is None:
+        return month_end(get_last_completed_month(pd.Timestamp("today")))
+    try:
+        as_of = month_end(value)
+    except (ValueError, OverflowError):
+        # OutOfBoundsDatetime is a ValueError
+        as_of = pd.NaT
+    if pd.isna(as_of) or not AS_OF_RANGE[0] <= as_of <= AS_OF_RANGE[1]:
+        raise BadRequest(f"as_of must be a date or month such as 2025-07, got {value!r}")
+    return as_of
+
+
+def project_param(target_df, query):
+    project = query_value(query, "project", ALL_PROJECTS)
+    if project != ALL_PROJECTS and project not in project_names(target_df):
+        raise NotFound(f"Unknown project {project!r}")
+    return project
+
+
+def summary_body(target_df, expense_df, query):
+    as_of = as_of_param(query)
+    project = project_param(target_df, query)
+    summary = performance_summary(target_df, as_of, project)
+    period = query_value(query, "period")
+    if period is not None and period not in PERIODS:
+        raise BadRequest(f"period must be one of {', '.join(PERIODS)}")
+    rows = period_rows(summary.frame, [period] if period else PERIODS, "metric").rename(columns={"group": "period"})
+    meta = {
+        "project": project,
+        "as_of": as_of.date().isoformat(),
+        "windows": {p: [start.date().isoformat(), end.date().isoformat()] for p, (start, end) in summary.windows.items()},
+    }
+    return meta, rows
+
+
+def portfolio_body(target_df, expense_df, query):
+    as_of = as_of_param(query)
+    portfolio = portfolio_comparison(target_df, as_of)
+    rows = period_rows(portfolio.frame, [metric for metric, _, _ in METRICS], "project").rename(columns={"group": "metric"})
+    return {"as_of": as_of.date().isoformat(), "period": "YTD"}, rows
+
+
+def monthly_body(target_df, expense_df, query):
+    as_of = as_of_param(query)
+    project = project_param(target_df, query)
+    breakdown = monthly_breakdown(target_df, as_of, project)
+    monthly = breakdown.monthly
+    parts = []
+    for metric, target_col, achieved_col in METRICS:
+        parts.append(pd.DataFrame({
+            "month": monthly.index.strftime("%Y-%m"),
+            "metric": metric,
+            "target": monthly[target_col].to_numpy(dtype="float64"),
+            "achieved": monthly[achieved_col].to_numpy(dtype="float64"),
+            "delta": (monthly[achieved_col] - monthly[target_col]).to_numpy(dtype="float64"),
+        }))
+    meta = {"project": project, "as_of": as_of.date().isoformat(), "financial_year": breakdown.title}
+    return meta, pd.concat(parts, ignore_index=True)
+
+
+def cash_flow_body(target_df, expense_df, query):
+    as_of = as_of_param(query)
+    summary = cash_flow(expense_df, target_df, as_of, show_details=query_value(query, "details", "0") == "1")
+    rows = period_rows(summary.frame, PERIODS, "row").rename(columns={"group": "period"})
+    rows.insert(1, "kind", rows["row"].map(summary.row_kinds))
+    return {"as_of": as_of.date().isoformat()}, rows
+
+
+def projects_body(target_df, expense_df, query):
+    return {}, pd.DataFrame({"project": project_names(target_df)})
+
+
+ENDPOINTS = {
+    "/summary": summary_body,
+    "/portfolio": portfolio_body,
+    "/monthly": monthly_body,
+    "/cash-flow": cash_flow_body,
+    "/projects": projects_body,
+}
+
+
+def encode(meta, rows, fmt):
+    if fmt == "arrow":
+        table = pa.Table.from_pandas(rows, preserve_index=False)
+        table = table.replace_schema_metadata({"aop": json.dumps(meta)})
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+    records = rows.astype(object).where(rows.notna(), None).to_dict(orient="records")
+    body = json.dumps({**meta, "rows": records}, default=lambda v: v.item() if isinstance(v, np.generic) else str(v))
+    return body.encode()
+
+
+def respond(path, query, accept=""):
+    """(status, content type, body) for a GET; encoded bodies are cached per dataset and query."""
+    if path == "/health":
+        key = _dataset["key"]
+        body = json.dumps({"status": "ok" if key else "no data", "dataset": key, "cache": response_cache.stats()})
+        return 200, "application/json", body.encode()
+    if path not in ENDPOINTS:
+        return 404, "application/json", json.dumps({"error": f"Unknown endpoint {path}"}).encode()
+    dataset = dict(_dataset)
+    if dataset["key"] is None:
+        return 503, "application/json", json.dumps({"error": "No data loaded yet"}).encode()
+
+    fmt = query_value(query, "format") or ("arrow" if ARROW_TYPE in accept else "json")
+    if fmt not in ["json", "arrow"]:
+        return 400, "application/json", json.dumps({"error": "format must be json or arrow"}).encode()
+    # The current month is part of the key because requests without as_of default to it
+    params = tuple(sorted((k, tuple(v)) for k, v in query.items() if k != "format"))
+    cache_key = (dataset["key"], path, fmt, params, pd.Timestamp("today").strftime("%Y-%m"))
+
+    def build():
+        meta, rows = ENDPOINTS[path](dataset["target"], dataset["expense"], query)
+        return encode(meta, rows, fmt)
+
+    try:
+        body = response_cache.get_or_compute(cache_key, build)
+    except (BadRequest, NotFound) as e:
+        return e.status, "application/json", json.dumps({"error": str(e)}).encode()
+    except Exception as e:
+        # Anything else is still answered, so a bad query never drops the connection
+        return 500, "application/json", json.dumps({"error": f"{type(e).__name__}: {e}"}).encode()
+    return 200, ARROW_TYPE if fmt == "arrow" else "application/json", body
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so a client issuing many requests reuses one connection
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY, delayed ACKs stall each reply
+    disable_nagle_algorithm = True
+    server_version = "AOPMetrics/1.0"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            status, content_type, body = respond(url.path.rstrip("/") or "/", parse_qs(url.query), self.headers.get("Accept", ""))
+        except Exception as e:
+            status, content_type, body = 500, "application/json", json.dumps({"error": f"{type(e).__name__}: {e}"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_error(405)
+
+    do_POST = do_PUT = do_DELETE = do_PATCH = do_HEAD
+
+    def log_message(self, format, *args):
+        pass
+
+
+def load_dataset(target_paths, expense_paths):
+    if target_paths and expense_paths:
+        return load_paths(target_paths, expense_paths)
+    if history_store.store_path() is None:
+        raise ValueError("Pass --target and --expense, or set AOP_HISTORY_DB to serve the history store")
+    target_df, expense_df, _ = history_store.sync()
+    return target_df, expense_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the dashboards' MTD/QTD/YTD and monthly figures over local HTTP.")
+    parser.add_argument("--target", nargs="+", help="target file(s); omit both to serve the history store")
+    parser.add_argument("--expense", nargs="+", help="expense file(s)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=port_from_env() or 8502)
+    args = parser.parse_args(argv)
+
+    try:
+        publish(*load_dataset(args.target, args.expense))
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"error: {e}\n")
+
+    server = ThreadingHTTPServer((args.host, args.port), MetricsHandler)
+    server.daemon_threads = True
+    print(f"Serving AOP metrics on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Month-close reports without Streamlit: one self-contained HTML page per project plus
+a portfolio rollup, rendered in a process pool.
+
+    python -m reports.batch --target data/target.csv --expense data/expense.csv --as-of 2025-07 --output-dir reports_out
+"""
+import argparse
+import hashlib
+import html
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+from plotly.offline import get_plotlyjs
+
+from utils.aop_engine import (
+    METRICS, attainment_trend, cash_flow, inflow_distribution, month_end, monthly_breakdown,
+    performance_summary, portfolio_comparison, project_names
+)
+from utils.as_of import PERIODS
+from utils.helper import compute_monthly_html_table, get_last_completed_month, plot_fy_metric, plot_inflow_by_project, plot_ytd_trend
+from utils.html_table import TABLE_CSS, flat_table, period_table
+from utils.load_data import load_paths
+from utils.summary_cube import ALL_PROJECTS
+
+PORTFOLIO_FILE = "portfolio.html"
+PERIOD_CAPTION = "MTD = Last completed month | QTD = Current quarter till last completed month | YTD = Financial year till last completed month"
+
+# The canonical frames, set once per worker process by init_worker
+_frames = {}
+
+
+def init_worker(target_df, expense_df):
+    _frames["target"] = target_df
+    _frames["expense"] = expense_df
+
+
+def report_filename(project):
+    return (re.sub(r"[^\w.-]+", "_", str(project)).strip("_.") or "project") + ".html"
+
+
+def report_filenames(projects):
+    """
+    {project: filename} with no two projects sharing a file (compared case-insensitively)
+    and none taking PORTFOLIO_FILE: a name that would clash gets a short hash of the
+    project name, so "A/B" and "A B" become "A_B_<hash>.html" rather than overwriting.
+    """
+    names = {project: report_filename(project) for project in projects}
+    counts = pd.Series([name.casefold() for name in names.values()]).value_counts()
+    taken = {PORTFOLIO_FILE} | set(counts.index)
+    for project, name in names.items():
+        if counts[name.casefold()] > 1 or name.casefold() == PORTFOLIO_FILE:
+            digest = hashlib.sha1(str(project).encode()).hexdigest()
+            size = 8
+            while (unique := f"{name[:-len('.html')]}_{digest[:size]}.html").casefold() in taken:
+                size += 4
+            names[project] = unique
+            taken.add(unique.casefold())
+    return names
+
+
+class Page:
+    """Collects a report's sections; the first chart carries plotly.js unless it is linked."""
+
+    def __init__(self, title, plotlyjs):
+        self.title = title
+        self.plotlyjs = plotlyjs
+        self.parts = [f"<h1>{html.escape(title)}</h1>"]
+
+    def heading(self, text, level=3):
+        self.parts.append(f"<h{level}>{html.escape(text)}</h{level}>")
+
+    def caption(self, text):
+        self.parts.append(f"<p class='caption'>{html.escape(text)}</p>")
+
+    def raw(self, markup):
+        self.parts.append(markup)
+
+    def chart(self, fig):
+        self.parts.append(fig.to_html(full_html=False, include_plotlyjs=self.plotlyjs))
+        if self.plotlyjs is True:
+            self.plotlyjs = False
+
+    def render(self):
+        return (
+            f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(self.title)}</title>"
+            f"{TABLE_CSS}<style>body {{ font-family: sans-serif; margin: 2em; }} .caption {{ color: #666; }}</style>"
+            "</head><body>" + "".join(self.parts) + "</body></html>"
+        )
+
+
+def target_sections(page, project, last_month, projects=None):
+    target_df = _frames["target"]
+
+    page.heading("Performance Summary")
+    page.raw(period_table(performance_summary(target_df, last_month, project).frame, "Metric", PERIODS, "aop-table"))
+    page.caption(PERIOD_CAPTION)
+    page.chart(plot_ytd_trend(attainment_trend(target_df, project).frame, METRICS, last_month))
+
+    if projects is not None:
+        page.heading("Portfolio Comparison (YTD)")
+        groups = [metric for metric, _, _ in METRICS]
+        page.raw(period_table(portfolio_comparison(target_df, last_month, projects).frame, "Project", groups, "aop-table"))
+
+    breakdown = monthly_breakdown(target_df, last_month, project)
+    page.heading(f"Monthly Breakdown Table ({breakdown.title})")
+    for metric, t_col, a_col in METRICS:
+        page.raw(compute_monthly_html_table(breakdown.monthly, metric, t_col, a_col))
+        page.chart(plot_fy_metric(breakdown.monthly, metric, t_col, a_col))
+
+
+def inflow_sections(page, project, last_month):
+    inflow = inflow_distribution(_frames["target"], last_month, project)
+    page.heading("Inflow Distribution by Project")
+    page.raw(flat_table(inflow.with_total(), "Project", "inflow-table", {"Total": "total-row"}))
+    page.chart(plot_inflow_by_project(inflow.frame))
+
+
+def render_report(project, last_month, output_dir, plotlyjs, filenames, projects=None):
+    """
+    Writes one project's report (or the portfolio rollup for ALL_PROJECTS) and returns
+    (path, seconds). `filenames` is report_filenames() over every project.
+    """
+    start = time.perf_counter()
+    month = last_month.strftime("%b %Y")
+    if project == ALL_PROJECTS:
+        page = Page(f"Portfolio – AOP Report as of {month}", plotlyjs)
+        page.raw(
+            "<p>" + " · ".join(
+                f"<a href='{html.escape(filenames[name])}'>{html.escape(str(name))}</a>" for name in projects
+            ) + "</p>"
+        )
+        path = Path(output_dir) / PORTFOLIO_FILE
+    else:
+        page = Page(f"{project} – AOP Report as of {month}", plotlyjs)
+        path = Path(output_dir) / filenames[project]
+
+    target_sections(page, project, last_month, projects if project == ALL_PROJECTS else None)
+    inflow_sections(page, project, last_month)
+    if project == ALL_PROJECTS:
+        summary = cash_flow(_frames["expense"], _frames["target"], last_month, show_details=True)
+        page.heading("Cash Flow Summary")
+        row_classes = {label: f"{kind}-row" for label, kind in summary.row_kinds.items()}
+        page.raw(period_table(summary.frame, "Expenses", PERIODS, "exp-table", row_classes))
+        page.caption(PERIOD_CAPTION)
+
+    path.write_text(page.render(), encoding="utf-8")
+    return path, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write HTML AOP reports for every project and the portfolio.")
+    parser.add_argument("--target", nargs="+", required=True, help="target file(s): CSV, Excel, Parquet or Feather")
+    parser.add_argument("--expense", nargs="+", required=True, help="expense file(s)")
+    parser.add_argument(
+        "--as-of", type=month_end, default=month_end(get_last_completed_month(pd.Timestamp("today"))),
+        help="last month the periods cover, e.g. 2025-07 (default: the last completed month)"
+    )
+    parser.add_argument("--output-dir", default="reports_out")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--plotlyjs", choices=["inline", "directory", "cdn"], default="inline",
+        help="inline keeps every page self-contained; directory writes plotly.min.js once next to the pages"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        target_df, expense_df = load_paths(args.target, args.expense)
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"error: {e}\n")
+    for source, error in target_df.attrs.get("source_errors", []) + expense_df.attrs.get("source_errors", []):
+        print(f"Skipped {source}: {error}", file=sys.stderr)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    plotlyjs = {"inline": True, "directory": "directory", "cdn": "cdn"}[args.plotlyjs]
+    if args.plotlyjs == "directory":
+        (output_dir / "plotly.min.js").write_text(get_plotlyjs(), encoding="utf-8")
+
+    projects = project_names(target_df)
+    filenames = report_filenames(projects)
+    started = time.perf_counter()
+    # Each worker receives the frames once; the as-of sweep and summary cube are then built once per worker
+    with ProcessPoolExecutor(
+        max_workers=max(args.workers, 1),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(target_df, expense_df),
+    ) as pool:
+        futures = [pool.submit(render_report, ALL_PROJECTS, args.as_of, output_dir, plotlyjs, filenames, projects)]
+        futures += [pool.submit(render_report, project, args.as_of, output_dir, plotlyjs, filenames) for project in projects]
+        for future in as_completed(futures):
+            path, seconds = future.result()
+            print(f"{path} ({seconds:.2f}s)")
+    print(f"{len(futures)} reports as of {args.as_of:%b %Y} written to {output_dir} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+from benchmarks.synthetic import make_expense, make_target
+
+
+class Upload(io.BytesIO):
+    """An in-memory file shaped like a Streamlit upload."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+
+@pytest.fixture(autouse=True)
+def isolated_env(tmp_path, monkeypatch):
+    # Sidecars go to a per-test folder, and no test reads the developer's history store
+    monkeypatch.setenv("AOP_SIDECAR_DIR", str(tmp_path / "sidecars"))
+    for var in ["AOP_HISTORY_DB", "AOP_CSV_STREAM_MB", "AOP_CSV_CHUNK_ROWS", "AOP_INGEST_POOL"]:
+        monkeypatch.delenv(var, raising=False)
+    # Nor does one test's upload come back from the in-memory caches in another
+    from utils.load_data import parse_cache, prepared_cache
+
+    parse_cache.clear()
+    prepared_cache.clear()
+
+
+@pytest.fixture
+def upload():
+    return Upload
+
+
+@pytest.fixture(scope="session")
+def target_csv():
+    # 3 projects x 4 years; DM inflow actuals carry three decimals, so half-cent sums occur
+    return make_target(3, 4, start_year=2022).to_csv(index=False).encode()
+
+
+@pytest.fixture(scope="session")
+def expense_csv():
+    return make_expense(9, 4, start_year=2022).to_csv(index=False).encode()
+
+
+@pytest.fixture
+def frames(target_csv, expense_csv):
+    """Canonical (target, expense) frames, loaded as uploads are."""
+    from utils.load_data import load_expense, load_target
+
+    return load_target(Upload("target.csv", target_csv)), load_expense(Upload("expense.csv", expense_csv))
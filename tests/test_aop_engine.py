@@ -0,0 +1,79 @@
+import io
+from decimal import ROUND_HALF_UP, Decimal
+
+import pandas as pd
+import pytest
+
+from utils.aop_engine import METRICS, cash_flow, inflow_distribution, month_end, performance_summary, project_names
+from utils.as_of import PERIODS, period_windows
+from utils.normalize import column_key
+from utils.summary_cube import ALL_PROJECTS
+
+
+def cents(value):
+    """An exact sum rounded half-up to the cent, as the tables should show it."""
+    return float(value.quantize(Decimal("0.01"), ROUND_HALF_UP))
+
+
+@pytest.fixture(scope="module")
+def uploaded(target_csv):
+    """The upload's values as exact decimals, read from the CSV text."""
+    df = pd.read_csv(io.BytesIO(target_csv), dtype=str)
+    df.columns = [column_key(col) for col in df.columns]
+    for _, target_col, achieved_col in METRICS:
+        df[target_col] = df[target_col].map(Decimal)
+        df[achieved_col] = df[achieved_col].map(Decimal)
+    df["monthstart"] = pd.to_datetime(df["year"] + " " + df["month"], format="%Y %B")
+    return df
+
+
+def as_of_months(df):
+    return [month_end(month) for month in pd.date_range(df["monthstart"].min(), df["monthstart"].max(), freq="MS")]
+
+
+def window_sum(df, window, col):
+    start, end = window
+    return sum(df.loc[(df["monthstart"] >= start) & (df["monthstart"] <= end), col], Decimal(0))
+
+
+def test_performance_summary_matches_exact_sums(frames, uploaded):
+    target_df, _ = frames
+    for as_of in as_of_months(uploaded):
+        windows = period_windows(as_of)
+        for project in [ALL_PROJECTS] + project_names(target_df):
+            rows = uploaded if project == ALL_PROJECTS else uploaded[uploaded["project"] == project]
+            summary = performance_summary(target_df, as_of, project)
+            for period in PERIODS:
+                for metric, target_col, achieved_col in METRICS:
+                    target = window_sum(rows, windows[period], target_col)
+                    achieved = window_sum(rows, windows[period], achieved_col)
+                    assert summary.value(metric, period, "Target") == cents(target)
+                    assert summary.value(metric, period, "Achieved") == cents(achieved)
+                    assert summary.value(metric, period, "Delta") == cents(achieved - target)
+
+
+def test_inflow_distribution_matches_exact_sums(frames, uploaded):
+    target_df, _ = frames
+    for as_of in as_of_months(uploaded):
+        windows = period_windows(as_of)
+        inflow = inflow_distribution(target_df, as_of).with_total()
+        for period in PERIODS:
+            expected = {
+                project: window_sum(rows, windows[period], "dm inflow actual")
+                for project, rows in uploaded.groupby("project")
+            }
+            expected["Total"] = sum(expected.values(), Decimal(0))
+            for project, value in expected.items():
+                assert inflow.at[project, f"{period} Inflow"] == cents(value)
+
+
+def test_cash_flow_total_inflow_matches_exact_sums(frames, uploaded):
+    target_df, expense_df = frames
+    for as_of in as_of_months(uploaded):
+        windows = period_windows(as_of)
+        summary = cash_flow(expense_df, target_df, as_of)
+        for period in PERIODS:
+            target = window_sum(uploaded, windows[period], "dm inflow target")
+            actual = window_sum(uploaded, windows[period], "dm inflow actual")
+            assert summary.value("Total Inflow", period, "Target") == cents(target)
+            assert summary.value("Total Inflow", period, "Achieved") == cents(actual)
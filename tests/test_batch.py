@@ -0,0 +1,45 @@
+import re
+
+import pandas as pd
+
+from reports.batch import PORTFOLIO_FILE, init_worker, render_report, report_filename, report_filenames
+from utils.aop_engine import month_end, project_names
+from utils.html_table import flat_table
+from utils.summary_cube import ALL_PROJECTS
+
+
+def test_report_filename_sanitises():
+    assert report_filename("Tower A / Phase 2") == "Tower_A_Phase_2.html"
+    assert report_filename("///") == "project.html"
+
+
+def test_report_filenames_never_collide():
+    projects = ["A/B", "A B", "a b", "Portfolio", "Tower 1"]
+    names = report_filenames(projects)
+
+    assert names["Tower 1"] == "Tower_1.html"
+    assert len({name.casefold() for name in names.values()} | {PORTFOLIO_FILE}) == len(projects) + 1
+    assert names == report_filenames(projects)
+
+
+def test_portfolio_links_every_project_page(frames, tmp_path):
+    target_df, expense_df = frames
+    target_df = target_df.copy()
+    target_df["project"] = target_df["project"].cat.rename_categories(lambda name: name.replace("Project ", "P/"))
+    init_worker(target_df, expense_df)
+    projects = project_names(target_df)
+    filenames = report_filenames(projects)
+    as_of = month_end("2024-07")
+
+    path, _ = render_report(ALL_PROJECTS, as_of, tmp_path, "cdn", filenames, projects)
+    links = re.findall(r"<a href='([^']*)'>", path.read_text(encoding="utf-8"))
+    assert links == [filenames[project] for project in projects]
+    for project in projects:
+        page, _ = render_report(project, as_of, tmp_path, "cdn", filenames)
+        assert page.name == filenames[project]
+
+
+def test_row_labels_are_escaped():
+    frame = pd.DataFrame({"Inflow": [1.0]}, index=["<b>R&D</b>"])
+    html = flat_table(frame, "Project", "inflow-table")
+    assert "<td>&lt;b&gt;R&amp;D&lt;/b&gt;</td>" in html
@@ -0,0 +1,49 @@
+import pandas as pd
+
+from utils.cache import LRUCache, budget_from_env, frame_token, tag_frame
+from utils.load_data import parse_cache, read_file
+
+
+def test_evicts_least_recently_used_within_budget():
+    cache = LRUCache(10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    assert cache.get("a") == "xxxx"
+    cache.put("c", "xxxx")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == "xxxx"
+    stats = cache.stats()
+    assert stats["bytes"] == 8 and stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_oversized_value_is_returned_but_not_stored():
+    cache = LRUCache(4, sizeof=len)
+    assert cache.get_or_compute("big", lambda: "xxxxxxxx") == "xxxxxxxx"
+    assert cache.stats()["entries"] == 0
+
+
+def test_budget_from_env(monkeypatch):
+    monkeypatch.setenv("AOP_TEST_MB", "0.5")
+    assert budget_from_env("AOP_TEST_MB", 8) == 512 * 1024
+    monkeypatch.setenv("AOP_TEST_MB", "lots")
+    assert budget_from_env("AOP_TEST_MB", 8) == 8 * 1024 * 1024
+
+
+def test_frame_token_only_while_the_shape_matches():
+    df = tag_frame(pd.DataFrame({"a": [1, 2, 3]}), "digest")
+    assert frame_token(df) == "digest"
+    assert frame_token(df[df["a"] > 1]) is None
+
+
+def test_read_file_parses_each_content_once(target_csv, upload):
+    parse_cache.clear()
+    first = read_file(upload("a.csv", target_csv))
+    misses = parse_cache.stats()["misses"]
+    # The same bytes under another name hit the cache, and callers get private copies
+    second = read_file(upload("b.csv", target_csv))
+    assert parse_cache.stats()["misses"] == misses
+    pd.testing.assert_frame_equal(first, second)
+    second.iloc[0, 0] = "changed"
+    assert read_file(upload("a.csv", target_csv)).iloc[0, 0] == first.iloc[0, 0]
@@ -0,0 +1,39 @@
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+
+from utils.cache import tag_frame
+from utils.figure_cache import cached_figure, figure_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    figure_cache.clear()
+
+
+def builder(calls):
+    def build():
+        calls.append(1)
+        return go.Figure(go.Bar(x=["a", "b"], y=[1, 2]))
+    return build
+
+
+def test_same_upload_and_key_reuse_the_figure():
+    df = tag_frame(pd.DataFrame({"a": [1, 2]}), "digest")
+    calls = []
+    first = cached_figure("bars", df, ("Project 1",), builder(calls))
+    again = cached_figure("bars", df, ("Project 1",), builder(calls))
+    other = cached_figure("bars", df, ("Project 2",), builder(calls))
+
+    assert again is first and other is not first
+    assert len(calls) == 2
+    assert first.json == first.figure.to_json()
+    assert figure_cache.stats()["bytes"] == first.nbytes + other.nbytes
+
+
+def test_frames_without_a_content_hash_are_rebuilt():
+    df = pd.DataFrame({"a": [1, 2]})
+    calls = []
+    cached_figure("bars", df, (), builder(calls))
+    cached_figure("bars", df, (), builder(calls))
+    assert len(calls) == 2 and figure_cache.stats()["entries"] == 0
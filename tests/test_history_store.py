@@ -0,0 +1,65 @@
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+from utils import history_store
+
+
+@pytest.fixture
+def conn(tmp_path):
+    with closing(history_store.connect(str(tmp_path / "history.db"))) as conn:
+        yield conn
+
+
+def test_upsert_counts_new_and_changed_rows(conn, frames):
+    target_df, _ = frames
+    months = target_df.groupby(["project", "monthstart"], observed=True).ngroups
+
+    assert history_store.upsert(conn, target_df, "target", "first") == months
+    assert history_store.revision(conn, "target") == 1
+    # The same upload again is skipped, and new bytes with the same totals change nothing
+    assert history_store.upsert(conn, target_df, "target", "first") == 0
+    assert history_store.upsert(conn, target_df, "target", "same totals") == 0
+    assert history_store.revision(conn, "target") == 1
+
+    latest = target_df[target_df["monthstart"] == target_df["monthstart"].max()].copy()
+    latest.loc[latest.index[0], "sales achieved"] += 1
+    assert history_store.upsert(conn, latest, "target", "latest month") == 1
+    assert history_store.revision(conn, "target") == 2
+
+
+def test_read_history_returns_the_monthly_totals(conn, frames):
+    target_df, expense_df = frames
+    history_store.upsert(conn, target_df, "target", "target")
+    history_store.upsert(conn, expense_df, "expense", "expense")
+
+    for kind, df in [("target", target_df), ("expense", expense_df)]:
+        spec = history_store.TABLES[kind]
+        stored = history_store.read_history(conn, kind)
+        expected = history_store.monthly_rows(df, kind)
+        actual = history_store.monthly_rows(stored, kind)
+        assert len(stored) == len(expected)
+        pd.testing.assert_frame_equal(
+            actual.sort_values(spec["keys"] + ["monthstart"], ignore_index=True),
+            expected.sort_values(spec["keys"] + ["monthstart"], ignore_index=True),
+            check_dtype=False, check_categorical=False,
+        )
+
+
+def test_sync_serves_stored_months_with_a_partial_upload(tmp_path, monkeypatch, frames):
+    monkeypatch.setenv("AOP_HISTORY_DB", str(tmp_path / "synced.db"))
+    target_df, expense_df = frames
+    history_store.sync(target_df, expense_df)
+
+    latest = target_df[target_df["monthstart"] == target_df["monthstart"].max()]
+    target, _, changes = history_store.sync(latest, None)
+    assert changes == {"target": 0}
+    assert len(target) == target_df.groupby(["project", "monthstart"], observed=True).ngroups
+
+
+def test_unopenable_store_raises_sqlite_error(monkeypatch):
+    monkeypatch.setenv("AOP_HISTORY_DB", "/nonexistent/dir/history.db")
+    with pytest.raises(sqlite3.Error):
+        history_store.has_rows("target")
@@ -0,0 +1,97 @@
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_expense, make_target
+from utils import ingest
+from utils.load_data import load_target, prepared_cache
+from utils.normalize import (
+    EXPENSE_CSV_DTYPES, TARGET_CSV_DTYPES, finish_expense, finish_target, prepare_expense,
+    prepare_expense_chunk, prepare_target, prepare_target_chunk
+)
+from utils.sidecar import sidecar_dir
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Many blocks per file, and a last block shorter than the rest
+    monkeypatch.setenv("AOP_CSV_CHUNK_ROWS", "7")
+
+
+def streamed_target(data):
+    return finish_target(*ingest.stream_chunks(data, TARGET_CSV_DTYPES, prepare_target_chunk))
+
+
+def streamed_expense(data):
+    return finish_expense(*ingest.stream_chunks(data, EXPENSE_CSV_DTYPES, prepare_expense_chunk))
+
+
+def test_streamed_target_matches_whole_file(target_csv, small_chunks):
+    whole = prepare_target(pd.read_csv(io.BytesIO(target_csv)))
+    pd.testing.assert_frame_equal(streamed_target(target_csv), whole)
+
+
+def test_streamed_latin1_expense_matches_whole_file(small_chunks):
+    df = make_expense(9, 2)
+    # The only non-ASCII byte sits well past the first encoding block
+    df.loc[len(df) - 1, "Expense"] = "Café"
+    data = df.to_csv(index=False).encode("latin1")
+    assert ingest.detect_encoding(data, block_bytes=64) == "latin1"
+
+    whole = prepare_expense(pd.read_csv(io.BytesIO(data), encoding="latin1"))
+    streamed = streamed_expense(data)
+    pd.testing.assert_frame_equal(streamed, whole)
+    assert "Café" in set(streamed["expense"])
+
+
+def test_detect_encoding_across_block_boundary():
+    data = "x" * 63 + "é" + "y"
+    assert ingest.detect_encoding(data.encode("utf-8"), block_bytes=64) == "utf-8"
+
+
+def test_quoted_line_breaks_and_crlf_stay_in_one_record(small_chunks):
+    df = make_expense(9, 2)
+    df.loc[::5, "Expense"] = 'Travel\n"Domestic", and abroad'
+    data = df.to_csv(index=False, lineterminator="\r\n").encode()
+
+    whole = prepare_expense(pd.read_csv(io.BytesIO(data)))
+    pd.testing.assert_frame_equal(streamed_expense(data), whole)
+
+
+def test_placeholder_rereads_only_its_block(monkeypatch, small_chunks):
+    df = make_target(4, 5)
+    df["Sales value Target"] = df["Sales value Target"].astype(object)
+    df.loc[len(df) - 1, "Sales value Target"] = "-"
+    data = df.to_csv(index=False).encode()
+
+    parsed_bytes = []
+    read_csv = pd.read_csv
+
+    def counting_read_csv(source, **kwargs):
+        if kwargs.get("header", "infer") is None:
+            parsed_bytes.append(source.getbuffer().nbytes)
+        return read_csv(source, **kwargs)
+
+    monkeypatch.setattr(ingest.pd, "read_csv", counting_read_csv)
+    streamed = streamed_target(data)
+    monkeypatch.setattr(ingest.pd, "read_csv", read_csv)
+
+    pd.testing.assert_frame_equal(streamed, prepare_target(pd.read_csv(io.BytesIO(data))))
+    assert pd.isna(streamed["sales target"].iloc[-1])
+    # Every row once, plus the placeholder's block read again as text
+    body = len(data) - data.index(b"\n") - 1
+    assert body < sum(parsed_bytes) <= body + max(parsed_bytes)
+
+
+def test_streamed_upload_keeps_a_sidecar(target_csv, upload, monkeypatch, small_chunks):
+    monkeypatch.setenv("AOP_CSV_STREAM_MB", "0")
+    first = load_target(upload("target.csv", target_csv))
+    assert list(sidecar_dir().glob("*.arrow"))
+
+    # A new process starts with empty caches and no parse: the sidecar is read instead
+    prepared_cache.clear()
+    monkeypatch.setattr(ingest, "read_chunks", lambda *args: pytest.fail("streamed CSV parsed again"))
+    again = load_target(upload("target.csv", target_csv))
+    pd.testing.assert_frame_equal(again, first)
+    assert again.attrs["memory_bytes"]["before"] == first.attrs["memory_bytes"]["before"]
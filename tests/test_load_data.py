@@ -0,0 +1,56 @@
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_target
+from utils.cache import content_hash
+from utils.load_data import load_target, prepare_sources
+from utils.normalize import prepare_target
+
+
+def csv_upload(name, df):
+    data = df.to_csv(index=False).encode()
+    return name, "csv", data, content_hash(data)
+
+
+@pytest.fixture
+def project_frames():
+    df = make_target(3, 2)
+    return [part for _, part in df.groupby("Project")]
+
+
+def test_multi_file_streamed_matches_whole_file(project_frames, monkeypatch):
+    uploads = [csv_upload(f"target_{i}.csv", part) for i, part in enumerate(project_frames)]
+    whole = prepare_sources(uploads, prepare_target)
+
+    monkeypatch.setenv("AOP_CSV_STREAM_MB", "0")
+    monkeypatch.setenv("AOP_CSV_CHUNK_ROWS", "5")
+    streamed = prepare_sources(uploads, prepare_target)
+    pd.testing.assert_frame_equal(streamed, whole)
+    assert streamed.attrs["source_errors"] == []
+
+
+def test_files_combine_like_one_upload(project_frames):
+    uploads = [csv_upload(f"target_{i}.csv", part) for i, part in enumerate(project_frames)]
+    combined = prepare_sources(uploads, prepare_target)
+    single = prepare_target(pd.concat(project_frames, ignore_index=True))
+    pd.testing.assert_frame_equal(combined, single)
+
+
+def test_workbook_sheets_load_and_bad_sheets_are_listed(project_frames, upload):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        for i, part in enumerate(project_frames):
+            part.to_excel(writer, sheet_name=f"P{i}", index=False)
+        pd.DataFrame({"note": ["no months here"]}).to_excel(writer, sheet_name="Notes", index=False)
+
+    df = load_target([upload("targets.xlsx", buffer.getvalue())])
+    assert sorted(df["project"].unique()) == sorted(part["Project"].iloc[0] for part in project_frames)
+    assert [source for source, _ in df.attrs["source_errors"]] == ["targets.xlsx / Notes"]
+
+
+def test_all_sources_failing_raises():
+    uploads = [csv_upload("bad.csv", pd.DataFrame({"note": ["x"]}))]
+    with pytest.raises(ValueError, match="bad.csv"):
+        prepare_sources(uploads, prepare_target)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from utils.aop_engine import long_trend, month_end, performance_summary, project_names
+from utils.helper import delta_segments, plot_long_trend
+
+
+def test_twelve_months_sum_to_the_financial_year(frames):
+    target_df, _ = frames
+    as_of = month_end("2025-03")
+    trend = long_trend(target_df, as_of, 12, "Sales Value")
+
+    assert trend.bucket_months == 1
+    assert trend.frame["target"].dtype == np.float64
+    totals = trend.frame.groupby("project", observed=True)[["target", "achieved"]].sum()
+    for project in project_names(target_df):
+        summary = performance_summary(target_df, as_of, project)
+        assert round(totals.at[project, "target"], 2) == summary.value("Sales Value", "YTD", "Target")
+        assert round(totals.at[project, "achieved"], 2) == summary.value("Sales Value", "YTD", "Achieved")
+
+
+def test_months_are_bucketed_to_stay_under_max_points(frames):
+    target_df, _ = frames
+    as_of = month_end("2025-12")
+    monthly = long_trend(target_df, as_of, 36, "Collection").frame
+    # 3 projects x 36 months is 108 points; quarters still give 36, half-years 18
+    trend = long_trend(target_df, as_of, 36, "Collection", max_points=30)
+
+    assert trend.bucket_months == 6
+    assert len(trend.frame) == 3 * 6
+    assert list(trend.frame["period"].unique()) == list(pd.date_range("2023-01-01", periods=6, freq="6MS"))
+    # Rows run project by project, month by month, so each bucket is six consecutive rows
+    expected = monthly["achieved"].to_numpy().reshape(-1, 6).sum(axis=1)
+    np.testing.assert_allclose(trend.frame["achieved"].to_numpy(), expected)
+
+
+def test_months_without_data_are_nan(frames):
+    target_df, _ = frames
+    trend = long_trend(target_df, month_end("2025-12"), 60, "Sales Unit")
+    before = trend.frame["period"] < "2022-01-01"
+    assert trend.frame.loc[before, ["target", "achieved"]].isna().all().all()
+    assert trend.frame.loc[~before, ["target", "achieved"]].notna().all().all()
+
+
+def test_deltas_are_two_segment_traces(frames):
+    target_df, _ = frames
+    trend = long_trend(target_df, month_end("2025-12"), 24, "Sales Value")
+    fig = plot_long_trend(trend)
+    assert len(fig.data) == 2 * len(project_names(target_df)) + 2
+
+    x, y = delta_segments(trend.frame.head(2))
+    assert x[2] is None and np.isnan(y[2])
+    assert x[0] == x[1] == "2024-01"
+    assert y[0] == round(trend.frame["target"].iloc[0], 2)
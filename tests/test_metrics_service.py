@@ -0,0 +1,80 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pytest
+
+import metrics_service
+from utils.aop_engine import month_end, performance_summary
+
+
+@pytest.fixture
+def dataset(monkeypatch):
+    monkeypatch.setattr(metrics_service, "_dataset", {"target": None, "expense": None, "key": None})
+    metrics_service.response_cache.clear()
+    return metrics_service._dataset
+
+
+@pytest.fixture
+def published(dataset, frames):
+    metrics_service.publish(*frames)
+    return dataset
+
+
+def get(path, **params):
+    status, content_type, body = metrics_service.respond(path, {k: [v] for k, v in params.items()})
+    return status, json.loads(body) if content_type == "application/json" else body
+
+
+def test_no_data_is_503(dataset):
+    assert get("/summary")[0] == 503
+    status, body = get("/health")
+    assert status == 200 and body["status"] == "no data"
+
+
+def test_unknown_endpoint_and_project_are_404(published):
+    assert get("/nope")[0] == 404
+    status, body = get("/summary", project="Nope", as_of="2025-07")
+    assert status == 404 and "Nope" in body["error"]
+
+
+@pytest.mark.parametrize("params", [
+    {"as_of": "not a month"},
+    {"as_of": "NaT"},
+    {"as_of": "1500-01"},
+    {"as_of": "9999-12"},
+    {"as_of": "2025-07", "period": "WTD"},
+    {"as_of": "2025-07", "format": "xml"},
+])
+def test_bad_parameters_are_400(published, params):
+    status, body = get("/summary", **params)
+    assert status == 400 and body["error"]
+
+
+def test_summary_rows_are_the_engine_values(published, frames):
+    status, body = get("/summary", project="Project 2", as_of="2025-07", period="YTD")
+    assert status == 200
+    assert body["project"] == "Project 2" and body["as_of"] == "2025-07-31"
+    summary = performance_summary(frames[0], month_end("2025-07"), "Project 2")
+    for row in body["rows"]:
+        assert row["achieved"] == summary.value(row["metric"], "YTD", "Achieved")
+
+
+def test_arrow_format_and_cached_body(published):
+    status, body = get("/portfolio", as_of="2025-07", format="arrow")
+    assert status == 200
+    table = pa.ipc.open_stream(body).read_all()
+    assert set(table.column("project").to_pylist()) == {"Project 1", "Project 2", "Project 3"}
+    assert json.loads(table.schema.metadata[b"aop"])["as_of"] == "2025-07-31"
+    hits = metrics_service.response_cache.stats()["hits"]
+    assert get("/portfolio", as_of="2025-07", format="arrow")[1] is body
+    assert metrics_service.response_cache.stats()["hits"] == hits + 1
+
+
+def test_import_does_not_load_streamlit():
+    code = "import sys, metrics_service, reports.batch; print('streamlit' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).parents[1])
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,43 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from utils.normalize import downcast_amounts, downcast_units, prepare_expense, prepare_target
+
+
+def test_two_decimal_amounts_become_float32():
+    assert downcast_amounts(pd.Series([1.25, 9999.99, np.nan])).dtype == np.float32
+
+
+def test_finer_or_large_amounts_stay_float64():
+    # Three decimals (DM inflows), and a value float32 can't hold within a tenth of a cent
+    assert downcast_amounts(pd.Series([76.398, 1.5])).dtype == np.float64
+    assert downcast_amounts(pd.Series([123456789.01])).dtype == np.float64
+
+
+def test_units_become_small_integers_unless_missing_or_fractional():
+    assert downcast_units(pd.Series([1.0, 9.0, 120.0])).dtype == np.int8
+    assert downcast_units(pd.Series([1.0, np.nan])).dtype == np.float32
+    assert downcast_units(pd.Series([1.5, 2.25])).dtype == np.float32
+
+
+def test_canonical_frames_are_compact(target_csv, expense_csv):
+    target = prepare_target(pd.read_csv(io.BytesIO(target_csv)))
+    expense = prepare_expense(pd.read_csv(io.BytesIO(expense_csv)))
+
+    assert isinstance(target["project"].dtype, pd.CategoricalDtype)
+    assert isinstance(expense["expense"].dtype, pd.CategoricalDtype)
+    assert target["sales target"].dtype == np.float32
+    assert target["dm inflow actual"].dtype == np.float64
+    assert target["unit achieved"].dtype == np.int8
+    for df in [target, expense]:
+        memory = df.attrs["memory_bytes"]
+        assert memory["after"] < memory["before"]
+
+
+def test_float32_amounts_round_trip_to_the_uploaded_values(target_csv):
+    raw = pd.read_csv(io.BytesIO(target_csv))
+    target = prepare_target(raw.copy())
+    restored = np.round(target["sales target"].to_numpy(dtype="float64"), 2)
+    np.testing.assert_array_equal(restored, raw["Sales value Target"].to_numpy())
@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+import pytest
+
+from utils import sidecar
+from utils.cache import content_hash
+from utils.load_data import parse_cache, read_cached
+
+
+def test_parsed_upload_is_reloaded_from_its_sidecar(target_csv, monkeypatch):
+    digest = content_hash(target_csv)
+    parse_cache.clear()
+    first = read_cached(target_csv, digest, "csv")
+    assert sidecar.sidecar_path((digest, "csv", 0, None)).exists()
+
+    # With the in-memory cache gone, the Arrow copy is read instead of the CSV
+    parse_cache.clear()
+    monkeypatch.setattr("utils.load_data.parse_bytes", lambda *args: pytest.fail("upload parsed again"))
+    pd.testing.assert_frame_equal(read_cached(target_csv, digest, "csv"), first)
+
+
+def test_empty_sidecar_dir_turns_the_store_off(monkeypatch):
+    monkeypatch.setenv("AOP_SIDECAR_DIR", "")
+    assert sidecar.sidecar_path(("digest", "csv", 0, None)) is None
+    sidecar.save_sidecar(("digest", "csv", 0, None), pd.DataFrame({"a": [1]}))
+    assert sidecar.load_sidecar(("digest", "csv", 0, None)) is None
+
+
+def test_unwritable_frame_leaves_no_files():
+    # Mixed-type object columns can't be stored as Arrow
+    sidecar.save_sidecar(("digest", "csv", 0, None), pd.DataFrame({"a": [1, "x"]}))
+    folder = sidecar.sidecar_dir()
+    assert not folder.exists() or not any(folder.iterdir())
+
+
+def test_prune_keeps_the_most_recently_used(monkeypatch):
+    monkeypatch.setenv("AOP_SIDECAR_MAX_MB", str(3000 / 2**20))
+    frame = pd.DataFrame({"a": range(100)})
+    for i, name in enumerate(["old", "mid", "new"]):
+        sidecar.save_sidecar((name, "csv", 0, None), frame)
+        path = sidecar.sidecar_path((name, "csv", 0, None))
+        os.utime(path, (1000 + i, 1000 + i))
+
+    sidecar.prune_sidecars(sidecar.sidecar_dir())
+    kept = {path.name.split("-")[0] for path in sidecar.sidecar_dir().glob("*.arrow")}
+    assert "new" in kept and "old" not in kept
@@ -0,0 +1,307 @@
+"""
+The dashboards' numbers without Streamlit: every function takes canonical frames (from
+utils.normalize.prepare_target/prepare_expense) plus an as-of date and returns a
+result object; invalid input raises ValueError. The components only render these,
+and reports/batch.py and benchmarks/run.py call them directly.
+"""
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from utils.as_of import PERIODS, build_as_of, period_windows
+from utils.cache import memoize_on_frame
+from utils.period_index import month_number
+from utils.expense_rollup import expense_rollup
+from utils.normalize import TARGET_NUM_COLS
+from utils.summary_cube import ALL_PROJECTS, build_summary_cube
+
+KINDS = ["Target", "Achieved", "Delta"]
+METRICS = [
+    ("Sales Unit", "unit target", "unit achieved"),
+    ("Sales Value", "sales target", "sales achieved"),
+    ("Collection", "collection target", "collection achieved"),
+    ("DM Inflows", "dm inflow target", "dm inflow actual"),
+]
+INFLOW_COLS = ["dm inflow actual", "dm inflow target"]
+EXPENSE_COLS = ["expense category", "expense", "actual", "target"]
+# Months summed into one point when a long trend would have too many; each divides 36–120 month horizons
+TREND_BUCKETS = [1, 3, 6, 12]
+
+
+@dataclass(frozen=True)
+class PeriodSummary:
+    """One row per label with flat "MTD Target" … "YTD Delta" columns."""
+    as_of: pd.Timestamp
+    windows: dict
+    frame: pd.DataFrame
+    # Row label -> highlight kind ("inflow", "outflow", "total", "net", ...)
+    row_kinds: dict = field(default_factory=dict)
+
+    def value(self, row, period, kind):
+        return self.frame.at[row, f"{period} {kind}"]
+
+
+@dataclass(frozen=True)
+class PortfolioComparison:
+    """YTD Target/Achieved/Delta per metric ("Sales Unit Target", ...) with one row per project."""
+    as_of: pd.Timestamp
+    frame: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class MonthlyBreakdown:
+    """Monthly totals of every target column for the twelve months of a financial year."""
+    fy_start: pd.Timestamp
+    project: str
+    monthly: pd.DataFrame
+
+    @property
+    def title(self):
+        return f"FY Apr {self.fy_start.year}–Mar {self.fy_start.year + 1}"
+
+
+@dataclass(frozen=True)
+class Trend:
+    """A period's sums at every month-end in the data, indexed by month-end."""
+    period: str
+    project: str
+    frame: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class LongTrend:
+    """
+    One metric's target and achieved per project over `months` months, in rows of
+    (project, period, target, achieved); `bucket_months` > 1 means each period sums
+    that many months. Periods without data are NaN.
+    """
+    metric: str
+    months: int
+    bucket_months: int
+    frame: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class InflowDistribution:
+    """MTD/QTD/YTD inflow per project ("MTD Inflow", ... columns beside "project")."""
+    as_of: pd.Timestamp
+    windows: dict
+    frame: pd.DataFrame
+
+    def with_total(self):
+        """The table as shown: a Total row over the exact sums, then every value rounded to the cent."""
+        frame = self.frame.set_index("project")
+        frame.loc["Total"] = frame.sum()
+        return rounded_frame(frame)
+
+
+def summary_frame(rows):
+    """
+    One row per label from {label: Series indexed by (group, "Target"/"Achieved"/"Delta")},
+    with flat "MTD Target"-style column names.
+    """
+    frame = pd.DataFrame(rows).T
+    frame.columns = [f"{group} {kind}" for group, kind in frame.columns]
+    return frame
+
+
+def require_columns(df, columns, name):
+    missing = [col for col in ["monthstart"] + columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"The {name} frame is missing columns: {', '.join(missing)}; prepare it with utils.normalize first")
+
+
+def month_end(as_of):
+    """The last day of the month containing `as_of`; every period ends there."""
+    return pd.Timestamp(as_of) + pd.offsets.MonthEnd(0)
+
+
+def round_cents(values):
+    """
+    Sums rounded half away from zero to the cent the tables show. The sweep's sums are
+    exact decimals, so a half cent is a true tie; formatting the float would round it by
+    however the tie happens to be stored in binary.
+    """
+    values = np.asarray(values, dtype="float64")
+    cents = np.abs(values) * 100
+    # Ties stored just below the half cent still round up; adding 0.0 turns -0.0 into 0.0
+    rounded = np.floor(cents + 0.5 + 1e-6 + cents * 1e-15) / 100
+    return np.copysign(rounded, values) + 0.0
+
+
+def rounded_frame(frame):
+    return pd.DataFrame(round_cents(frame.to_numpy(dtype="float64")), index=frame.index, columns=frame.columns)
+
+
+def target_as_of(target_df):
+    require_columns(target_df, ["project"] + TARGET_NUM_COLS, "target")
+    return build_as_of(target_df, TARGET_NUM_COLS, "project")
+
+
+def inflow_as_of(target_df):
+    require_columns(target_df, ["project"] + INFLOW_COLS, "target")
+    return build_as_of(target_df, INFLOW_COLS, "project")
+
+
+def project_names(target_df):
+    """Projects in upload order, as the target dashboard lists them."""
+    return target_df["project"].dropna().unique().tolist()
+
+
+def inflow_projects(target_df):
+    """Projects in sorted order, as the inflow distribution lists them."""
+    return inflow_as_of(target_df).keys
+
+
+def performance_summary(target_df, as_of, project=ALL_PROJECTS):
+    """MTD/QTD/YTD Target/Achieved/Delta per metric for one project or ALL_PROJECTS."""
+    as_of = month_end(as_of)
+    sweep = target_as_of(target_df)
+    windows = period_windows(as_of)
+    rows = {metric: {} for metric, _, _ in METRICS}
+    for period in PERIODS:
+        if project == ALL_PROJECTS:
+            sums = sweep.total(as_of, period)
+        else:
+            sums = sweep.sum(as_of, period, project)
+        for metric, target_col, achieved_col in METRICS:
+            values = [sums[target_col], sums[achieved_col], sums[achieved_col] - sums[target_col]]
+            rows[metric].update({(period, kind): value for kind, value in zip(KINDS, values)})
+    frame = rounded_frame(summary_frame({metric: pd.Series(values) for metric, values in rows.items()}))
+    return PeriodSummary(as_of, windows, frame)
+
+
+def portfolio_comparison(target_df, as_of, projects=None):
+    """YTD figures for `projects` (default: every project), zero where a project has no rows."""
+    as_of = month_end(as_of)
+    projects = project_names(target_df) if projects is None else projects
+    by_project = target_as_of(target_df).sum_by_key(as_of, "YTD").reindex(projects, fill_value=0)
+    # Built column by column; one Series per project would be aligned row by row
+    columns = {}
+    for metric, target_col, achieved_col in METRICS:
+        target, achieved = by_project[target_col], by_project[achieved_col]
+        for kind, values in zip(KINDS, [target, achieved, achieved - target]):
+            columns[f"{metric} {kind}"] = values
+    return PortfolioComparison(as_of, pd.DataFrame(columns).rename_axis(None))
+
+
+def attainment_trend(target_df, project=ALL_PROJECTS, period="YTD"):
+    frame = target_as_of(target_df).trend(period, None if project == ALL_PROJECTS else project)
+    return Trend(period, project, frame)
+
+
+def monthly_breakdown(target_df, as_of, project=ALL_PROJECTS):
+    """
+    The financial year containing `as_of`, month by month; months without data stay
+    NaN so tables and charts leave them blank.
+    """
+    require_columns(target_df, ["project"] + TARGET_NUM_COLS, "target")
+    fy_start = period_windows(month_end(as_of))["YTD"][0]
+    months = pd.date_range(start=fy_start, periods=12, freq="MS")
+    return MonthlyBreakdown(fy_start, project, build_summary_cube(target_df)[project].reindex(months))
+
+
+def trend_max_points():
+    """Most (project, period) points a long trend plots before months are bucketed (AOP_TREND_MAX_POINTS)."""
+    try:
+        return max(int(os.environ.get("AOP_TREND_MAX_POINTS", 5000)), 1)
+    except ValueError:
+        return 5000
+
+
+def project_monthly(target_df):
+    # Summed in float64: multi-year sales sums pass 2**24, where float32 drops whole units
+    values = target_df[TARGET_NUM_COLS].astype("float64")
+    return (
+        values.groupby([target_df["project"], target_df["monthstart"]], observed=True)
+        .sum(min_count=1)
+        .reset_index()
+    )
+
+
+def long_trend(target_df, as_of, months, metric, max_points=None):
+    """
+    Monthly target/achieved of `metric` for every project over the `months` months up
+    to `as_of`. When projects × months exceeds `max_points`, consecutive months are
+    summed into quarters, half-years or years so the figure stays small.
+    """
+    require_columns(target_df, ["project"] + TARGET_NUM_COLS, "target")
+    target_col, achieved_col = {name: (t, a) for name, t, a in METRICS}[metric]
+    max_points = trend_max_points() if max_points is None else max_points
+    projects = project_names(target_df)
+    bucket = next(
+        (b for b in TREND_BUCKETS if len(projects) * -(-months // b) <= max_points), TREND_BUCKETS[-1]
+    )
+
+    last = month_number(month_end(as_of))
+    first = last - months + 1
+    monthly = memoize_on_frame("project_monthly", target_df, project_monthly)
+    month_numbers = monthly["monthstart"].to_numpy(dtype="datetime64[M]").astype("int64") + 1970 * 12
+    in_window = (month_numbers >= first) & (month_numbers <= last)
+    window = monthly[in_window]
+    # Buckets count from the start of the window, so every bucket but the last is complete
+    starts = month_numbers[in_window]
+    starts = starts - (starts - first) % bucket
+    period = pd.Series((starts - 1970 * 12).astype("datetime64[M]").astype("datetime64[ns]"), index=window.index, name="period")
+
+    sums = window.groupby([window["project"], period], observed=True)[[target_col, achieved_col]].sum(min_count=1)
+    periods = pd.date_range(pd.Timestamp(first // 12, first % 12 + 1, 1), periods=-(-months // bucket), freq=f"{bucket}MS")
+    grid = pd.MultiIndex.from_product([projects, periods], names=["project", "period"])
+    frame = sums.reindex(grid).reset_index().rename(columns={target_col: "target", achieved_col: "achieved"})
+    return LongTrend(metric, months, bucket, frame)
+
+
+def inflow_distribution(target_df, as_of, project=ALL_PROJECTS):
+    """MTD/QTD/YTD inflow per project, one row per project with inflow in any period."""
+    as_of = month_end(as_of)
+    sweep = inflow_as_of(target_df)
+    windows = period_windows(as_of)
+    inflows = []
+    for period in PERIODS:
+        inflow = sweep.sum_by_key(as_of, period)["dm inflow actual"]
+        if project != ALL_PROJECTS:
+            inflow = inflow[inflow.index == project]
+        inflows.append(inflow)
+    frame = pd.concat(inflows, axis=1)
+    frame.columns = [f"{period} Inflow" for period in PERIODS]
+    return InflowDistribution(as_of, windows, frame.fillna(0).reset_index())
+
+
+def cash_flow(expense_df, target_df, as_of, show_details=False):
+    """
+    Total inflow, total outflow and net cash (plus category subtotals and expense heads
+    when `show_details`), highlighted through the summary's row_kinds.
+    """
+    as_of = month_end(as_of)
+    require_columns(expense_df, EXPENSE_COLS, "expense")
+    heads, subtotals, totals = expense_rollup(expense_df, as_of)
+
+    sweep = inflow_as_of(target_df)
+    windows = period_windows(as_of)
+    inflow = {}
+    for period in PERIODS:
+        d = sweep.total(as_of, period)
+        target, actual = d["dm inflow target"], d["dm inflow actual"]
+        inflow.update({(period, kind): value for kind, value in zip(KINDS, [target, actual, actual - target])})
+    inflow = pd.Series(inflow)
+
+    # Net Cash = Inflow - Outflow; the deltas subtract too, so Delta stays Achieved - Target
+    net_cash = inflow - totals[inflow.index]
+
+    # Whole blocks of rows are concatenated, so the heads keep the rollup's column layout
+    blocks = [inflow.rename("Total Inflow").to_frame().T, totals.rename("Total Outflow").to_frame().T]
+    row_kinds = {"Total Inflow": "inflow", "Total Outflow": "outflow"}
+    if show_details:
+        for category, subtotal in subtotals.iterrows():
+            blocks.append(subtotal.rename(f"{category} Subtotal").to_frame().T)
+            row_kinds[f"{category} Subtotal"] = "total"
+            detail = heads.xs(category, level="category")
+            blocks.append(detail)
+            row_kinds.update(dict.fromkeys(detail.index, "exp-detail"))
+    blocks.append(net_cash.rename("Net Cash Flow").to_frame().T)
+    row_kinds["Net Cash Flow"] = "net"
+
+    frame = pd.concat(blocks).rename_axis(None)
+    frame.columns = [f"{group} {kind}" for group, kind in frame.columns]
+    return PeriodSummary(as_of, windows, rounded_frame(frame), row_kinds)
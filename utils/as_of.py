@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from utils.cache import memoize_on_frame
+from utils.diagnostics import stage
+from utils.period_index import build_expense_index, build_period_index, month_number
+
+PERIODS = ["MTD", "QTD", "YTD"]
+FY_START_MONTH = 4
+
+
+def period_starts(months):
+    """
+    First month of each period ending at `months` (absolute month numbers): the month
+    itself, its calendar quarter and its April–March financial year.
+    """
+    month_of_year = months % 12
+    return {
+        "MTD": months,
+        "QTD": months - month_of_year % 3,
+        "YTD": months - (month_of_year - (FY_START_MONTH - 1)) % 12,
+    }
+
+
+def period_windows(as_of):
+    """{"MTD": (start, end), ...} for the month containing `as_of`, as the dashboards filter them."""
+    as_of = pd.Timestamp(as_of)
+    end = as_of.replace(day=as_of.days_in_month)
+    starts = period_starts(np.array([month_number(as_of)]))
+    return {
+        period: (pd.Timestamp(int(start[0]) // 12, int(start[0]) % 12 + 1, 1), end)
+        for period, start in starts.items()
+    }
+
+
+class AsOfSweep:
+    """
+    MTD, QTD and YTD sums of a CumulativeIndex for every month it covers, computed in
+    one vectorised pass. Moving the as-of date is then an array lookup, and the
+    history of a period (e.g. how YTD evolved month by month) is a slice.
+    Months outside the data fall back to the index itself, so lookups never miss.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.value_cols = index.value_cols
+        self.keys = index.keys
+        self.first_month = index.first_month
+        self.n_months = index.n_months
+
+        months = np.arange(self.first_month, self.first_month + self.n_months)
+        hi = months - self.first_month + 1
+        self.sums, self.totals = {}, {}
+        for period, starts in period_starts(months).items():
+            lo = np.clip(starts - self.first_month, 0, self.n_months)
+            # (month, key, channel); the last channel counts rows, as in CumulativeIndex
+            self.sums[period] = self.index.to_values(
+                (self.index.cumulative[:, hi] - self.index.cumulative[:, lo]).transpose(1, 0, 2)
+            )
+            self.totals[period] = self.index.to_values(self.index.total_cumulative[hi] - self.index.total_cumulative[lo])
+
+    @property
+    def nbytes(self):
+        return self.index.nbytes + sum(a.nbytes for a in self.sums.values()) + sum(a.nbytes for a in self.totals.values())
+
+    @property
+    def month_ends(self):
+        months = (np.arange(self.first_month, self.first_month + self.n_months) - 1970 * 12).astype("datetime64[M]")
+        return pd.DatetimeIndex(months.astype("datetime64[ns]"), name="as of") + pd.offsets.MonthEnd(0)
+
+    def _slot(self, as_of):
+        slot = month_number(pd.Timestamp(as_of)) - self.first_month
+        return slot if 0 <= slot < self.n_months else None
+
+    def total(self, as_of, period):
+        slot = self._slot(as_of)
+        if slot is None:
+            return self.index.total(*period_windows(as_of)[period])
+        return pd.Series(self.totals[period][slot, :-1], index=self.value_cols)
+
+    def sum(self, as_of, period, key):
+        slot = self._slot(as_of)
+        if slot is None or key not in self.index._positions:
+            return self.index.sum(*period_windows(as_of)[period], key)
+        return pd.Series(self.sums[period][slot, self.index._positions[key], :-1], index=self.value_cols)
+
+    def sum_by_key(self, as_of, period, present_only=True):
+        slot = self._slot(as_of)
+        if slot is None:
+            return self.index.sum_by_key(*period_windows(as_of)[period], present_only)
+        sums = self.sums[period][slot]
+        present = sums[:, -1] > 0 if present_only else np.ones(len(self.keys), dtype=bool)
+        return pd.DataFrame(
+            sums[present, :-1],
+            index=pd.Index([k for k, p in zip(self.keys, present) if p], name=self.index.key_col),
+            columns=self.value_cols,
+        )
+
+    def trend(self, period, key=None):
+        """The period's sums at every month-end in the data, for one key or the total."""
+        if key is None:
+            values = self.totals[period][:, :-1]
+        elif key in self.index._positions:
+            values = self.sums[period][:, self.index._positions[key], :-1]
+        else:
+            values = np.zeros((self.n_months, len(self.value_cols)))
+        return pd.DataFrame(values, index=self.month_ends, columns=self.value_cols)
+
+
+def build_as_of(df, value_cols, key_col=None):
+    """MTD/QTD/YTD for every month-end over `value_cols` per `key_col`; built once per upload."""
+    index = build_period_index(df, value_cols, key_col)
+    with stage(f"as-of sweep ({key_col or 'total'})"):
+        return memoize_on_frame(
+            "as_of", df, lambda df, value_cols, key_col: AsOfSweep(index), tuple(value_cols), key_col
+        )
+
+
+def build_expense_as_of(expense_df):
+    index = build_expense_index(expense_df)
+    with stage("as-of sweep (expense)"):
+        return memoize_on_frame("expense_as_of", expense_df, lambda df: AsOfSweep(index))
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def budget_from_env(var_name, default_mb):
+    """
+    Reads a cache budget in megabytes from the environment and returns it in bytes.
+    Falls back to `default_mb` when the variable is unset or not a number.
+    """
+    try:
+        mb = float(os.environ.get(var_name, default_mb))
+    except ValueError:
+        mb = default_mb
+    return int(mb * 1024 * 1024)
+
+
+def sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(sizeof(v) for v in value.values())
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by an approximate memory budget (bytes).
+    Module-level instances live for the whole server process, so entries are
+    shared by every Streamlit session and survive reruns.
+    """
+
+    def __init__(self, max_bytes, sizeof=sizeof):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            # An entry larger than the whole budget is returned to the caller but never stored
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Structures derived from canonical frames (period indexes, summaries, ...)
+derived_cache = LRUCache(budget_from_env("AOP_DERIVED_CACHE_MB", 128))
+
+
+def tag_frame(df, digest):
+    df.attrs["content_hash"] = digest
+    df.attrs["shape"] = df.shape
+    return df
+
+
+def frame_token(df):
+    """
+    Returns the content hash of a canonical frame, or None for anything else.
+    pandas copies attrs onto filtered/derived frames, so the tag only counts
+    while the shape still matches the frame it was recorded on.
+    """
+    if df.attrs.get("shape") != df.shape:
+        return None
+    return df.attrs.get("content_hash")
+
+
+def memoize_on_frame(name, df, build, *args):
+    token = frame_token(df)
+    if token is None:
+        return build(df, *args)
+    return derived_cache.get_or_compute((token, name) + args, lambda: build(df, *args))
@@ -0,0 +1,153 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+DEFAULT_LOG_PATH = Path(__file__).resolve().parent.parent / ".cache" / "diagnostics.jsonl"
+
+# The recorder for the script run on this thread; None when diagnostics are off
+_current = contextvars.ContextVar("diagnostics_run", default=None)
+# Recorders whose rerun hasn't finished; tracemalloc runs only while there are any.
+# Weak, so a rerun cut short (st.stop, a dead session) doesn't keep tracing on for good.
+_recording = weakref.WeakSet()
+_tracing_lock = threading.Lock()
+
+
+class RunRecorder:
+    """
+    Wall time and peak traced allocation per stage, plus rendered payload sizes, for one rerun.
+    tracemalloc's peak is process-wide: while several sessions record at once, a stage's
+    peak includes their allocations and may miss some of its own when another resets it.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self.payloads = []
+        # One [current bytes at entry, highest peak seen by nested stages] per open stage
+        self._open = []
+
+    def enter(self, name):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._open:
+            self._open[-1][1] = max(self._open[-1][1], peak)
+        tracemalloc.reset_peak()
+        # Listed in the order stages start, so nested stages follow their parent
+        entry = {"stage": name, "seconds": 0.0, "peak_bytes": 0}
+        self.stages.append(entry)
+        self._open.append([current, 0, entry])
+
+    def exit(self, seconds):
+        start_bytes, nested_peak, entry = self._open.pop()
+        peak = max(tracemalloc.get_traced_memory()[1], nested_peak)
+        if self._open:
+            self._open[-1][1] = max(self._open[-1][1], peak)
+        entry["seconds"] = seconds
+        entry["peak_bytes"] = max(peak - start_bytes, 0)
+
+    def to_record(self):
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "total_seconds": time.perf_counter() - self.started,
+            "stages": self.stages,
+            "payloads": self.payloads,
+        }
+
+
+def default_enabled():
+    return os.environ.get("AOP_DIAGNOSTICS", "0") == "1"
+
+
+def start_run(enabled):
+    """
+    Starts recording this rerun when `enabled`. Peak allocation comes from tracemalloc,
+    which slows Python allocations down while it runs, so it is only started on demand and
+    stopped again once no rerun is recording.
+    """
+    release(_current.get())
+    if not enabled:
+        _current.set(None)
+        return None
+    recorder = RunRecorder()
+    with _tracing_lock:
+        _recording.add(recorder)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    _current.set(recorder)
+    return recorder
+
+
+def release(recorder):
+    """Ends `recorder`'s claim on tracemalloc, stopping it once no other rerun is recording."""
+    with _tracing_lock:
+        if recorder is not None:
+            _recording.discard(recorder)
+        if not _recording and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+@contextmanager
+def stage(name):
+    recorder = _current.get()
+    if recorder is None:
+        yield
+        return
+    recorder.enter(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.exit(time.perf_counter() - start)
+
+
+def record_payload(kind, name, payload):
+    """Records the size of what is sent to the browser; `payload` is a callable, only run when recording."""
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.payloads.append({"kind": kind, "name": name, "bytes": len(payload())})
+
+
+def log_path():
+    return Path(os.environ.get("AOP_DIAGNOSTICS_LOG", str(DEFAULT_LOG_PATH)))
+
+
+def append_log(record):
+    path = log_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError:
+        pass
+
+
+def finish_run(recorder):
+    """Shows the rerun's measurements in a collapsible panel and appends them to the JSONL log."""
+    if recorder is None:
+        return
+    # Imported here so stage() and record_payload() work in processes without Streamlit
+    import streamlit as st
+
+    record = recorder.to_record()
+    release(recorder)
+    _current.set(None)
+    append_log(record)
+
+    with st.expander(f"🩺 Diagnostics – rerun took {record['total_seconds']:.3f}s"):
+        if record["stages"]:
+            stages = pd.DataFrame(record["stages"])
+            stages["peak MB"] = stages.pop("peak_bytes") / 2**20
+            st.dataframe(stages, hide_index=True)
+        if record["payloads"]:
+            payloads = pd.DataFrame(record["payloads"])
+            payloads["KB"] = payloads.pop("bytes") / 1024
+            st.dataframe(payloads, hide_index=True)
+        st.caption(f"Appended to {log_path()}. Project-picker changes rerun only their section and aren't recorded.")
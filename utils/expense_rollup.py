@@ -0,0 +1,41 @@
+import pandas as pd
+from utils.cache import memoize_on_frame
+from utils.as_of import PERIODS, build_expense_as_of
+
+UNCATEGORIZED = "Uncategorized"
+
+
+def head_categories(expense_df):
+    # A head listed under several categories keeps the last one, as the old dict lookup did
+    pairs = expense_df[["expense", "expense category"]].astype(object).drop_duplicates(subset="expense", keep="last")
+    return pairs.dropna(subset=["expense"]).set_index("expense")["expense category"].fillna(UNCATEGORIZED)
+
+
+def expense_rollup(expense_df, as_of):
+    """
+    Target/Achieved/Delta for every expense head in the upload over MTD, QTD and YTD
+    for the month containing `as_of`, with category subtotals and a grand total.
+    Returns (heads, subtotals, total): heads indexed by (category, expense), subtotals
+    by category, total as a Series; columns are (period, "Target"/"Achieved"/"Delta").
+    """
+    sweep = build_expense_as_of(expense_df)
+    categories = memoize_on_frame("head_categories", expense_df, head_categories)
+
+    frames = {}
+    for period in PERIODS:
+        sums = sweep.sum_by_key(as_of, period, present_only=False)
+        frames[period] = pd.DataFrame({
+            "Target": sums["target"],
+            "Achieved": sums["actual"],
+            "Delta": sums["actual"] - sums["target"],
+        })
+    heads = pd.concat(frames, axis=1)
+    heads.index = pd.MultiIndex.from_arrays(
+        [categories.reindex(heads.index).fillna(UNCATEGORIZED).to_numpy(), heads.index],
+        names=["category", "expense"]
+    )
+    heads = heads.sort_index()
+
+    subtotals = heads.groupby(level="category").sum()
+    total = heads.sum()
+    return heads, subtotals, total
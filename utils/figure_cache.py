@@ -0,0 +1,39 @@
+"""
+Built Plotly figures shared by every session, keyed by the upload's content hash plus
+whatever else the chart depends on (project, financial year, metric, ...). A rerun that
+changes nothing the chart reads gets the same figure back without rebuilding it;
+st.plotly_chart still serializes it each time. The JSON kept beside it sizes the entry
+for the cache budget and the diagnostics payload log.
+"""
+from dataclasses import dataclass
+
+from utils.cache import LRUCache, budget_from_env, frame_token
+
+figure_cache = LRUCache(budget_from_env("AOP_FIGURE_CACHE_MB", 64))
+
+
+@dataclass(frozen=True)
+class CachedFigure:
+    figure: object
+    json: str
+
+    @property
+    def nbytes(self):
+        # The figure object holds roughly as much again as its JSON
+        return 2 * len(self.json)
+
+
+def cached_figure(name, df, key, build):
+    """
+    The figure `build()` returns for chart `name` over canonical frame `df`, built once
+    per (content hash, name, *key). Frames without a content hash are never cached.
+    Callers must treat the figure as read-only; it is shared across sessions.
+    """
+    def compute():
+        fig = build()
+        return CachedFigure(fig, fig.to_json())
+
+    token = frame_token(df)
+    if token is None:
+        return compute()
+    return figure_cache.get_or_compute((token, name) + tuple(key), compute)
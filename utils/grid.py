@@ -0,0 +1,55 @@
+import os
+import pandas as pd
+import streamlit as st
+from utils.as_of import PERIODS
+
+# Highlighted rows by kind; the HTML tables use the matching "<kind>-row" CSS classes
+ROW_STYLES = {
+    "total": "font-weight: bold; background-color: #f0f0f0",
+    "inflow": "font-weight: bold; background-color: #e8f5e9",
+    "outflow": "font-weight: bold; background-color: #f9f9f9",
+    "net": "font-weight: bold; background-color: #fff8dc",
+}
+
+
+def html_tables():
+    """
+    Tables render as Arrow-backed grids by default; AOP_TABLE_MODE=html switches
+    back to the hand-built HTML markup.
+    """
+    return os.environ.get("AOP_TABLE_MODE", "grid").strip().lower() == "html"
+
+
+def delta_columns(frame):
+    return [col for col in frame.columns if col.endswith("Delta")]
+
+
+def delta_text(val, decimals=2):
+    if pd.isna(val):
+        return ""
+    arrow = "↑" if val >= 0 else "↓"
+    return f"{arrow} {val:,.{decimals}f}"
+
+
+def delta_style(val):
+    if pd.isna(val):
+        return ""
+    color = "green" if val >= 0 else "red"
+    return f"color: {color}; font-weight: bold"
+
+
+def show_grid(frame, index_label, decimals=2, delta=None, row_kinds=None):
+    """
+    Renders a table as an st.dataframe. Numbers get thousands separators and
+    `decimals` places (NaN stays blank); cells selected by `delta` (any Styler subset)
+    get the ↑/↓ arrow and green/red colouring, and `row_kinds` maps row labels to a
+    ROW_STYLES highlight.
+    """
+    styler = frame.rename_axis(index_label).style.format(f"{{:,.{decimals}f}}", na_rep="")
+    if delta is not None:
+        styler = styler.format(lambda val: delta_text(val, decimals), subset=delta)
+        styler = styler.map(delta_style, subset=delta)
+    if row_kinds:
+        styles = {label: ROW_STYLES.get(kind, "") for label, kind in row_kinds.items()}
+        styler = styler.apply(lambda row: [styles.get(row.name, "")] * len(row), axis=1)
+    st.dataframe(styler)
@@ -1,27 +1,48 @@
-import streamlit as st
+import numpy as np
 import pandas as pd
+import plotly.express as px
 import plotly.graph_objects as go
+from utils.html_table import html_table, flat_header, number, delta
 
 valid_months = [
     "January", "February", "March", "April", "May", "June",
     "July", "August", "September", "October", "November", "December"
 ]
 
-def find_invalid_months(month_series):
+month_ordinals = {name: i for i, name in enumerate(valid_months, start=1)}
+
+def parse_month_year(month_series, year_series):
     """
-    Checks a pandas Series of month names for invalid values.
-    Returns a list of invalid month names (after stripping and title-casing).
+    Builds month-start dates from month names and years without string parsing.
+    Month names are normalised once per distinct value and looked up in
+    `month_ordinals`; the dates are then plain integer arithmetic on datetime64[M].
+    Returns (normalised month names, monthstart series, invalid month names).
     """
-    seen = set()
+    codes, uniques = pd.factorize(month_series)
+    names = pd.Index(uniques).astype(str).str.strip().str.title()
+    ordinals = names.map(month_ordinals).to_numpy(dtype="float64")
+
     invalid_months = []
-    for raw_month in month_series.dropna().unique():
-        month = str(raw_month).strip().title()
-        if month not in valid_months and month not in seen:
+    seen = set()
+    for raw_month, name, ordinal in zip(uniques, names, ordinals):
+        if np.isnan(ordinal) and name not in seen:
             invalid_months.append(raw_month)
-            seen.add(month)
-    return invalid_months
+            seen.add(name)
+    if (codes == -1).any():
+        invalid_months.append("nan")
+
+    # factorize marks missing months with -1, which picks the trailing NaN slot
+    month_num = np.append(ordinals, np.nan)[codes]
+    month_names = pd.Series(np.append(names.to_numpy(dtype=object), "Nan")[codes], index=month_series.index)
 
+    years = pd.to_numeric(year_series, errors="coerce").to_numpy(dtype="float64")
+    months_since_epoch = (years - 1970) * 12 + (month_num - 1)
+    valid = ~np.isnan(months_since_epoch) & (years == np.floor(years))
 
+    monthstart = np.full(len(codes), np.datetime64("NaT"), dtype="datetime64[M]")
+    monthstart[valid] = months_since_epoch[valid].astype("int64")
+    monthstart = pd.Series(monthstart.astype("datetime64[ns]"), index=month_series.index)
+    return month_names, monthstart, invalid_months
 
 def get_financial_year_start(current_date):
     return pd.Timestamp(year=current_date.year if current_date.month >= 4 else current_date.year - 1, month=4, day=1)
@@ -45,56 +66,32 @@ def safe_parse_dm_inflows(df):
     if "dm inflows target" in df.columns:
         df["DM Inflows target"] = pd.to_numeric(df["dm inflows target"], errors="coerce")
     return df
-def compute_monthly_html_table(df, months_list, metric_name, target_col, achieved_col):
-        month_names = [dt.strftime('%b-%y') for dt in months_list]
-
-        html = f"<h4 style='margin-top: 30px;'>{metric_name}</h4>"
-        html += """
-        <table style='border-collapse: collapse; font-size: 16px; width: 100%;'>
-            <thead>
-                <tr>
-                    <th style='padding:10px;border:1px solid #ddd;text-align:left;'>Type</th>
-        """
-        for m in month_names:
-            html += f"<th style='padding:10px;border:1px solid #ddd;text-align:center;'>{m}</th>"
-        html += "</tr></thead><tbody>"
-
-        for row_type in ["Target", "Achieved", "Delta"]:
-            html += f"<tr><td style='padding:10px;border:1px solid #ddd; font-weight: bold;'>{row_type}</td>"
-            for dt in months_list:
-                month_data = df[df["monthstart"] == dt]
-                target = month_data[target_col].sum() if not month_data.empty else ""
-                achieved = month_data[achieved_col].sum() if not month_data.empty else ""
-                delta = achieved - target if target != "" and achieved != "" else ""
-
-                if row_type == "Target":
-                    value = f"{target:,.0f}" if target != "" else ""
-                    html += f"<td style='padding:10px;border:1px solid #ddd; text-align:center;'>{value}</td>"
-                elif row_type == "Achieved":
-                    value = f"{achieved:,.0f}" if achieved != "" else ""
-                    html += f"<td style='padding:10px;border:1px solid #ddd; text-align:center;'>{value}</td>"
-                else:
-                    if delta == "":
-                        html += "<td style='padding:10px;border:1px solid #ddd;'></td>"
-                    else:
-                        color = "green" if delta >= 0 else "red"
-                        arrow = "↑" if delta >= 0 else "↓"
-                        html += f"<td style='padding:10px;border:1px solid #ddd; text-align:center; color:{color}; font-weight:bold;'>{arrow} {delta:,.0f}</td>"
-            html += "</tr>"
-        html += "</tbody></table><br>"
-        return html
-def plot_fy_metric(df, months_list, metric_name, target_col, achieved_col):
-        # Prepare data
-        month_labels = [dt.strftime('%b-%y') for dt in months_list]
-        targets, achieveds = [], []
+def compute_monthly_html_table(monthly, metric_name, target_col, achieved_col):
+        frame = monthly_grid_frame(monthly, target_col, achieved_col)
+        columns = [(month, number(0)) for month in frame.columns]
+        table = html_table(
+            frame, columns, "month-table", flat_header("Type", frame.columns),
+            row_formats={"Delta": delta(0)}
+        )
+        return f"<h4 class='month-title'>{metric_name}</h4>{table}<br>"
+
+
+def monthly_grid_frame(monthly, target_col, achieved_col):
+    """Target/Achieved/Delta rows by month, the layout of compute_monthly_html_table."""
+    frame = pd.DataFrame({
+        "Target": monthly[target_col],
+        "Achieved": monthly[achieved_col],
+        "Delta": monthly[achieved_col] - monthly[target_col],
+    }).T
+    frame.columns = [dt.strftime('%b-%y') for dt in monthly.index]
+    return frame
 
-        for dt in months_list:
-            month_data = df[df["monthstart"] == dt]
-            target = month_data[target_col].sum() if not month_data.empty else None
-            achieved = month_data[achieved_col].sum() if not month_data.empty else None
 
-            targets.append(target)
-            achieveds.append(achieved)
+def plot_fy_metric(monthly, metric_name, target_col, achieved_col):
+        # Prepare data
+        month_labels = [dt.strftime('%b-%y') for dt in monthly.index]
+        targets = [None if pd.isna(v) else v for v in monthly[target_col]]
+        achieveds = [None if pd.isna(v) else v for v in monthly[achieved_col]]
 
         # Build base figure
         fig = go.Figure()
@@ -155,6 +152,103 @@ def plot_fy_metric(df, months_list, metric_name, target_col, achieved_col):
 
 
 
+def plot_ytd_trend(trend, metrics, as_of_date):
+        """YTD achieved as a % of YTD target at every month-end, one line per metric."""
+        fig = go.Figure()
+        for metric_name, target_col, achieved_col in metrics:
+            target = trend[target_col].where(trend[target_col] != 0)
+            attainment = trend[achieved_col] / target * 100
+            fig.add_trace(go.Scatter(
+                x=trend.index,
+                y=[None if pd.isna(v) else v for v in attainment],
+                mode='lines+markers',
+                name=metric_name,
+                marker=dict(size=5)
+            ))
+        fig.add_hline(y=100, line_dash="dot", line_color="grey")
+        fig.add_vline(x=as_of_date, line_dash="dash", line_color="grey")
+        fig.update_layout(
+            title="YTD Attainment by Month-End (% of YTD Target)",
+            xaxis_title="As of",
+            yaxis_title="% of target",
+            height=420,
+            margin=dict(t=50, b=30),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+        )
+        return fig
+
+
+
+def delta_segments(frame):
+        """One trace's x/y for target→achieved segments, each pair separated by a gap."""
+        x = np.full(len(frame) * 3, None, dtype=object)
+        y = np.full(len(frame) * 3, np.nan)
+        labels = frame["period"].dt.strftime("%Y-%m").to_numpy()
+        x[0::3] = x[1::3] = labels
+        y[0::3] = frame["target"].to_numpy(dtype="float64")
+        y[1::3] = frame["achieved"].to_numpy(dtype="float64")
+        return x.tolist(), y.round(2)
+
+
+def plot_long_trend(trend):
+        """
+        Target (dotted) and achieved per project over a long horizon. WebGL traces carry
+        the lines, and every delta goes into one of two segment traces (ahead/behind)
+        rather than an annotation per point.
+        """
+        fig = go.Figure()
+        colors = px.colors.qualitative.Plotly
+        for i, (project, rows) in enumerate(trend.frame.groupby("project", sort=False, observed=True)):
+            x = rows["period"].dt.strftime("%Y-%m").tolist()
+            color = colors[i % len(colors)]
+            fig.add_trace(go.Scattergl(
+                x=x, y=rows["achieved"].to_numpy(dtype="float64").round(2), mode="lines",
+                name=str(project), legendgroup=str(project), line=dict(color=color, width=2)
+            ))
+            fig.add_trace(go.Scattergl(
+                x=x, y=rows["target"].to_numpy(dtype="float64").round(2), mode="lines",
+                name=f"{project} target", legendgroup=str(project), showlegend=False,
+                line=dict(color=color, width=1, dash="dot")
+            ))
+
+        both = trend.frame.dropna(subset=["target", "achieved"])
+        ahead = both["achieved"] >= both["target"]
+        for name, rows, color in [("Ahead of target", both[ahead], "green"), ("Behind target", both[~ahead], "red")]:
+            x, y = delta_segments(rows)
+            fig.add_trace(go.Scattergl(
+                x=x, y=y, mode="lines", name=name, opacity=0.35,
+                line=dict(color=color, width=3), hoverinfo="skip"
+            ))
+
+        step = "" if trend.bucket_months == 1 else f" ({trend.bucket_months}-month sums)"
+        fig.update_layout(
+            title=f"{trend.metric} – Target vs Achieved, last {trend.months} months{step}",
+            xaxis_title="Month",
+            yaxis_title=trend.metric,
+            height=520,
+            margin=dict(t=50, b=30),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+        )
+        return fig
+
+
+def plot_inflow_by_project(inflow_summary):
+        inflow_long = inflow_summary.melt(id_vars="project", 
+                                        var_name="Period", 
+                                        value_name="Inflow")
+
+        return px.bar(
+            inflow_long,
+            x="project",
+            y="Inflow",  # ⚠️ use correct column name with capital 'I'
+            color="Period",
+            barmode="group",
+            text_auto=True,
+            title="Inflow by Project – MTD vs QTD vs YTD"
+        )
+
+
+
 
 
 
@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, budget_from_env, content_hash, tag_frame
+from utils.normalize import TARGET_NUM_COLS, TARGET_UNIT_COLS, compact_dtypes, frame_bytes
+
+# Monthly totals per key; a (key, month) row is only rewritten when one of its values changed
+TABLES = {
+    "target": {"keys": ["project"], "values": TARGET_NUM_COLS},
+    "expense": {"keys": ["expense category", "expense"], "values": ["actual", "target"]},
+}
+
+# History frames keyed by (database path, kind, revision); a new revision replaces the frame
+history_cache = LRUCache(budget_from_env("AOP_HISTORY_CACHE_MB", 128))
+_schema_lock = threading.Lock()
+
+
+def store_path():
+    """
+    Location of the SQLite history store, from AOP_HISTORY_DB. Unset or empty keeps
+    the dashboards working from the uploaded files alone.
+    """
+    path = os.environ.get("AOP_HISTORY_DB", "")
+    return path or None
+
+
+def quoted(col):
+    return '"' + col.replace('"', '""') + '"'
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    with _schema_lock, conn:
+        for kind, spec in TABLES.items():
+            cols = [f"{quoted(col)} TEXT NOT NULL" for col in spec["keys"]]
+            cols += ["monthstart TEXT NOT NULL"] + [f"{quoted(col)} REAL" for col in spec["values"]]
+            keys = ", ".join(quoted(col) for col in spec["keys"] + ["monthstart"])
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {kind}_monthly ({', '.join(cols)}, PRIMARY KEY ({keys}))")
+        conn.execute("CREATE TABLE IF NOT EXISTS uploads (digest TEXT, kind TEXT, loaded_at TEXT, changed_rows INTEGER, PRIMARY KEY (digest, kind))")
+        conn.execute("CREATE TABLE IF NOT EXISTS revisions (kind TEXT PRIMARY KEY, revision INTEGER NOT NULL)")
+    return conn
+
+
+def monthly_rows(df, kind):
+    """Sums a canonical frame to one row per key and month, in the store's column order."""
+    spec = TABLES[kind]
+    values = df[spec["values"]].astype("float64")
+    # float32 amounts only ever hold 2-decimal values (see downcast_amounts); rounding
+    # restores them exactly, so unchanged rows compare equal to what is stored
+    for col in spec["values"]:
+        if df[col].dtype == np.float32:
+            values[col] = values[col].round(2)
+    keys = df[spec["keys"]].astype(object).fillna("")
+    monthly = (
+        pd.concat([keys, df["monthstart"], values], axis=1)
+        .groupby(spec["keys"] + ["monthstart"], observed=True)[spec["values"]]
+        .sum(min_count=1)
+        .round(6)
+        .reset_index()
+    )
+    monthly["monthstart"] = monthly["monthstart"].dt.strftime("%Y-%m-%d")
+    return monthly
+
+
+def upsert(conn, df, kind, digest):
+    """
+    Upserts an upload's monthly totals and returns how many (key, month) rows were new
+    or changed. Rows missing from the upload are kept, so a file with only the latest
+    month is enough; a file seen before (same digest) is skipped.
+    """
+    if conn.execute("SELECT 1 FROM uploads WHERE digest = ? AND kind = ?", (digest, kind)).fetchone():
+        return 0
+    spec = TABLES[kind]
+    rows = monthly_rows(df, kind)
+    cols = spec["keys"] + ["monthstart"] + spec["values"]
+    names = ", ".join(quoted(col) for col in cols)
+    keys = ", ".join(quoted(col) for col in spec["keys"] + ["monthstart"])
+    updates = ", ".join(f"{quoted(col)} = excluded.{quoted(col)}" for col in spec["values"])
+    changed = " OR ".join(f"{kind}_monthly.{quoted(col)} IS NOT excluded.{quoted(col)}" for col in spec["values"])
+    sql = (
+        f"INSERT INTO {kind}_monthly ({names}) VALUES ({', '.join('?' * len(cols))}) "
+        f"ON CONFLICT ({keys}) DO UPDATE SET {updates} WHERE {changed}"
+    )
+    records = [
+        tuple(None if isinstance(v, float) and np.isnan(v) else v for v in row)
+        for row in rows[cols].itertuples(index=False, name=None)
+    ]
+    with conn:
+        before = conn.total_changes
+        conn.executemany(sql, records)
+        changed_rows = conn.total_changes - before
+        if changed_rows:
+            conn.execute(
+                "INSERT INTO revisions VALUES (?, 1) ON CONFLICT (kind) DO UPDATE SET revision = revision + 1",
+                (kind,)
+            )
+        conn.execute(
+            "INSERT INTO uploads VALUES (?, ?, ?, ?)",
+            (digest, kind, datetime.now(timezone.utc).isoformat(), changed_rows)
+        )
+    return changed_rows
+
+
+def revision(conn, kind):
+    row = conn.execute("SELECT revision FROM revisions WHERE kind = ?", (kind,)).fetchone()
+    return row[0] if row else 0
+
+
+def has_rows(kind):
+    path = store_path()
+    if path is None:
+        return False
+    with closing(connect(path)) as conn:
+        return conn.execute(f"SELECT 1 FROM {kind}_monthly LIMIT 1").fetchone() is not None
+
+
+def read_history(conn, kind):
+    """The stored monthly totals as a canonical frame, as prepare_target/prepare_expense build it."""
+    spec = TABLES[kind]
+    names = ", ".join(quoted(col) for col in spec["keys"] + ["monthstart"] + spec["values"])
+    order = ", ".join(["monthstart"] + [quoted(col) for col in spec["keys"]])
+    df = pd.read_sql_query(f"SELECT {names} FROM {kind}_monthly ORDER BY {order}", conn)
+    for col in spec["keys"]:
+        df[col] = df[col].replace("", np.nan)
+    df["monthstart"] = pd.to_datetime(df["monthstart"]).astype("datetime64[ns]")
+    df["month"] = df["monthstart"].dt.month_name()
+    df["year"] = df["monthstart"].dt.year
+    df[spec["values"]] = df[spec["values"]].astype("float64")
+    raw_bytes = frame_bytes(df)
+    if kind == "target":
+        amount_cols = [col for col in TARGET_NUM_COLS if col not in TARGET_UNIT_COLS]
+        return compact_dtypes(df, ["project"], TARGET_UNIT_COLS, amount_cols, raw_bytes)
+    return compact_dtypes(df, ["expense category", "expense"], [], spec["values"], raw_bytes)
+
+
+def load_history(conn, kind):
+    path = store_path()
+    rev = revision(conn, kind)
+    digest = content_hash(f"history:{path}:{kind}:{rev}".encode())
+    df = history_cache.get_or_compute((path, kind, rev), lambda: tag_frame(read_history(conn, kind), digest))
+    return df.copy(deep=False)
+
+
+def sync(target_df=None, expense_df=None):
+    """
+    Upserts whichever canonical frames were uploaded and returns
+    (target history, expense history, {kind: rows added or changed}).
+    """
+    changes = {}
+    with closing(connect(store_path())) as conn:
+        for kind, df in [("target", target_df), ("expense", expense_df)]:
+            if df is not None:
+                digest = df.attrs.get("content_hash") or content_hash(pd.util.hash_pandas_object(df).values.tobytes())
+                changes[kind] = upsert(conn, df, kind, digest)
+        return load_history(conn, "target"), load_history(conn, "expense"), changes
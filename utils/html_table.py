@@ -0,0 +1,141 @@
+from html import escape
+
+import pandas as pd
+from utils.diagnostics import record_payload
+
+# Styles for every HTML table on the page; emitted once per run instead of once per table
+TABLE_CSS = """
+<style>
+    .aop-table, .exp-table, .inflow-table {
+        border-collapse: collapse;
+        width: 100%;
+        font-size: 14px;
+    }
+    .exp-table, .inflow-table {
+        margin-top: 10px;
+    }
+    .aop-table th, .aop-table td,
+    .exp-table th, .exp-table td,
+    .inflow-table th, .inflow-table td,
+    .month-table th, .month-table td {
+        padding: 10px;
+        border: 1px solid #ddd;
+        text-align: center;
+    }
+    .aop-header, .exp-header, .inflow-header {
+        background-color: #f2f2f2;
+        font-weight: bold;
+    }
+    .month-title {
+        margin-top: 30px;
+    }
+    .month-table {
+        border-collapse: collapse;
+        font-size: 16px;
+        width: 100%;
+    }
+    .month-table th:first-child {
+        text-align: left;
+    }
+    .month-table td:first-child {
+        text-align: left;
+        font-weight: bold;
+    }
+    .delta-up { color: green; font-weight: bold; }
+    .delta-down { color: red; font-weight: bold; }
+    .total-row { font-weight: bold; background-color: #f0f0f0; }
+    .inflow-row { font-weight: bold; background-color: #e8f5e9; }
+    .outflow-row { font-weight: bold; background-color: #f9f9f9; }
+    .net-row { font-weight: bold; background-color: #fff8dc; }
+</style>
+"""
+
+
+def emit_table_css():
+    show_html(TABLE_CSS, "table css")
+
+
+def show_html(html, name):
+    # Imported here so the table builders work without Streamlit (reports, the engine's imports)
+    import streamlit as st
+
+    record_payload("markdown", name, lambda: html.encode())
+    st.markdown(html, unsafe_allow_html=True)
+
+
+def number(decimals=2):
+    def fmt(val):
+        return "" if pd.isna(val) else f"{val:,.{decimals}f}"
+    return fmt
+
+
+def delta(decimals=2):
+    def fmt(val):
+        if pd.isna(val):
+            return ""
+        direction, arrow = ("up", "↑") if val >= 0 else ("down", "↓")
+        return f"<span class='delta-{direction}'>{arrow} {val:,.{decimals}f}</span>"
+    return fmt
+
+
+def period_columns(groups, decimals=2):
+    """Column spec for flat "MTD Target"/"MTD Achieved"/"MTD Delta" columns per group."""
+    return [
+        (f"{group} {kind}", delta(decimals) if kind == "Delta" else number(decimals))
+        for group in groups for kind in ["Target", "Achieved", "Delta"]
+    ]
+
+
+def grouped_header(label, groups, header_class):
+    kinds = "<th>Target</th><th>Achieved</th><th>Delta</th>"
+    return (
+        f"<tr class='{header_class}'><th rowspan='2'>{label}</th>"
+        + "".join(f"<th colspan='3'>{group}</th>" for group in groups)
+        + f"</tr><tr class='{header_class}'>" + kinds * len(groups) + "</tr>"
+    )
+
+
+def flat_header(label, headers, header_class=None):
+    attrs = f" class='{header_class}'" if header_class else ""
+    return f"<tr{attrs}><th>{label}</th>" + "".join(f"<th>{header}</th>" for header in headers) + "</tr>"
+
+
+def render_rows(frame, columns, row_classes=None, row_formats=None):
+    """
+    Renders `frame` (one row per label in the index) as <tr> rows. `columns` is a list
+    of (column, formatter); `row_formats` maps a row label to a formatter that replaces
+    them for that row and `row_classes` maps row labels to a CSS class. Cells are
+    formatted column by column and the rows are filled into one compiled template;
+    row labels (project names, months) are escaped, cells are formatter markup.
+    """
+    row_classes = row_classes or {}
+    row_formats = row_formats or {}
+    template = "<tr{}><td>{}</td>" + "<td>{}</td>" * len(columns) + "</tr>"
+    cells = [[fmt(val) for val in frame[col]] for col, fmt in columns]
+    for i, label in enumerate(frame.index):
+        if label in row_formats:
+            for c, (col, _) in enumerate(columns):
+                cells[c][i] = row_formats[label](frame[col].iloc[i])
+    attrs = [f" class='{row_classes[label]}'" if label in row_classes else "" for label in frame.index]
+    labels = [escape(str(label)) for label in frame.index]
+    return "".join(template.format(*row) for row in zip(attrs, labels, *cells))
+
+
+def html_table(frame, columns, css_class, header, row_classes=None, row_formats=None):
+    return (
+        f"<table class='{css_class}'>{header}"
+        + render_rows(frame, columns, row_classes, row_formats)
+        + "</table>"
+    )
+
+
+def period_table(frame, label, groups, css_class, row_classes=None):
+    """A summary frame's "<group> Target/Achieved/Delta" columns under one header per group."""
+    header = grouped_header(label, groups, css_class.replace("-table", "-header"))
+    return html_table(frame, period_columns(groups), css_class, header, row_classes)
+
+
+def flat_table(frame, label, css_class, row_classes=None):
+    """Every column of `frame` as plain numbers under a one-row header."""
+    header = flat_header(label, frame.columns, css_class.replace("-table", "-header"))
+    return html_table(frame, [(col, number()) for col in frame.columns], css_class, header, row_classes)
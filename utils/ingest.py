@@ -0,0 +1,133 @@
+import codecs
+import io
+import os
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from utils.cache import budget_from_env
+from utils.diagnostics import stage
+from utils.normalize import column_key, frame_bytes
+
+ENCODING_BLOCK_BYTES = 1024 * 1024
+
+
+def detect_encoding(data, block_bytes=ENCODING_BLOCK_BYTES):
+    """
+    Picks a CSV upload's encoding: UTF-8 when the whole buffer decodes as UTF-8,
+    otherwise latin1 (legacy Excel exports), which decodes any byte. The check runs
+    block by block so no decoded copy of the file is kept, and the file is parsed once.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    view = memoryview(data)
+    try:
+        for start in range(0, len(view), block_bytes):
+            decoder.decode(view[start:start + block_bytes], final=False)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "latin1"
+    return "utf-8"
+
+
+def stream_threshold_bytes():
+    """CSV uploads at least this large (AOP_CSV_STREAM_MB) are read in chunks."""
+    return budget_from_env("AOP_CSV_STREAM_MB", 32)
+
+
+def chunk_rows():
+    try:
+        return max(int(os.environ.get("AOP_CSV_CHUNK_ROWS", 100_000)), 1)
+    except ValueError:
+        return 100_000
+
+
+def csv_dtypes(data, encoding, dtypes):
+    """Maps the upload's raw headers to the types listed in `dtypes` by canonical name."""
+    header = pd.read_csv(io.BytesIO(data), nrows=0, encoding=encoding).columns
+    return {raw: dtypes[column_key(raw)] for raw in header if column_key(raw) in dtypes}
+
+
+def line_end(data, start, pos):
+    """
+    Offset just past the first line break at or after `pos` that ends a record, given that
+    a record starts at `start`: quotes inside fields are doubled, so a break ends a record
+    when the quotes since `start` are balanced.
+    """
+    quotes = data.count(b'"', start, pos)
+    while True:
+        end = data.find(b"\n", pos)
+        if end < 0:
+            return len(data)
+        end += 1
+        quotes += data.count(b'"', pos, end)
+        if quotes % 2 == 0:
+            return end
+        pos = end
+
+
+def block_bounds(data, rows):
+    """
+    (start, end) byte ranges of about `rows` records each after the header line,
+    estimated from the average line length at the top of the file.
+    """
+    sample = data[:64 * 1024]
+    block_bytes = max(rows * len(sample) // max(sample.count(b"\n"), 1), 1)
+    bounds = []
+    start = line_end(data, 0, 0)
+    while start < len(data):
+        end = line_end(data, start, min(start + block_bytes, len(data)) - 1)
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def read_block(block, encoding, names, dtype):
+    try:
+        return pd.read_csv(io.BytesIO(block), encoding=encoding, header=None, names=names, dtype=dtype)
+    except pd.errors.ParserError:
+        raise
+    except (TypeError, ValueError):
+        # A cell the dtype map can't convert (e.g. "-" in an amount column): this block
+        # alone is read with those columns as text and the prepare step coerces them
+        return pd.read_csv(
+            io.BytesIO(block), encoding=encoding, header=None, names=names, dtype={raw: "str" for raw in dtype}
+        )
+
+
+def read_chunks(data, encoding, dtype, prepare_chunk, rows):
+    header = pd.read_csv(io.BytesIO(data), nrows=0, encoding=encoding, dtype=dtype)
+    chunks, raw_bytes = [], 0
+    for start, end in block_bounds(data, rows):
+        block = data[start:end]
+        if not block.strip():
+            continue
+        chunk = read_block(block, encoding, list(header.columns), dtype)
+        raw_bytes += frame_bytes(chunk)
+        with stage(f"prepare chunk {len(chunks) + 1}"):
+            chunks.append(prepare_chunk(chunk))
+    if not chunks:
+        chunks.append(prepare_chunk(header))
+    return chunks, raw_bytes
+
+
+def concat_chunks(chunks):
+    """Concatenates prepared chunks, keeping categorical columns categorical across them."""
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([chunk[col] for chunk in chunks], sort_categories=True).categories
+            for chunk in chunks:
+                chunk[col] = chunk[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def stream_chunks(data, dtypes, prepare_chunk):
+    """
+    Parses a CSV upload in blocks of about AOP_CSV_CHUNK_ROWS rows and prepares each
+    block as it is read, so only one raw block is held at a time; returns (prepared
+    chunks concatenated, raw bytes read) for the finishing step to compact. Parse
+    errors surface as pandas ParserError, validation errors from `prepare_chunk` as
+    ValueError.
+    """
+    encoding = detect_encoding(data)
+    chunks, raw_bytes = read_chunks(data, encoding, csv_dtypes(data, encoding, dtypes), prepare_chunk, chunk_rows())
+    return concat_chunks(chunks), raw_bytes
@@ -1,8 +1,36 @@
+import io
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import pandas as pd
 import base64
-import streamlit as st
+from utils.cache import LRUCache, budget_from_env, content_hash, tag_frame
+from utils.diagnostics import stage
+from utils.normalize import (
+    prepare_target, prepare_expense, prepare_target_chunk, prepare_expense_chunk,
+    finish_target, finish_expense, TARGET_CSV_DTYPES, EXPENSE_CSV_DTYPES
+)
+from utils.ingest import concat_chunks, detect_encoding, stream_chunks, stream_threshold_bytes
+from utils.normalize import frame_bytes
+from utils.sidecar import load_sidecar, save_sidecar
+
+SUPPORTED_TYPES = ["csv", "xlsx", "xls", "parquet", "feather"]
+
+# Parsed uploads keyed by (sha256 of the bytes, parser options); shared across sessions
+parse_cache = LRUCache(budget_from_env("AOP_PARSE_CACHE_MB", 256))
+# Canonical frames keyed by (sha256 of the bytes, prepare step)
+prepared_cache = LRUCache(budget_from_env("AOP_PREPARED_CACHE_MB", 256))
+
+# How large CSV uploads are streamed: (dtype map, per-chunk step, final step) per prepare step
+CSV_STREAMS = {
+    prepare_target: (TARGET_CSV_DTYPES, prepare_target_chunk, finish_target),
+    prepare_expense: (EXPENSE_CSV_DTYPES, prepare_expense_chunk, finish_expense),
+}
 
 def render_svg(svg_path):
+    # Imported here so load_paths and the parsers work without Streamlit (reports, the metrics service)
+    import streamlit as st
+
     with open(svg_path, "r") as f:
         svg_data = f.read()
     b64 = base64.b64encode(svg_data.encode()).decode()
@@ -14,22 +42,229 @@ def render_svg(svg_path):
     st.markdown(html, unsafe_allow_html=True)
 
 
-def read_file(file):
-    try:
-        file_ext = file.name.split('.')[-1].lower()
+def file_bytes(file):
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    file.seek(0)
+    return file.read()
 
-        if file_ext == "csv":
-            try:
-                return pd.read_csv(file, encoding="utf-8")
-            except UnicodeDecodeError:
-                # Fallback encodings for legacy Excel-exported CSVs
-                return pd.read_csv(file, encoding="latin1")
-        
-        elif file_ext in ["xls", "xlsx"]:
-            return pd.read_excel(file, sheet_name=0)  # Reads first sheet by default
-        
-        else:
-            raise ValueError("Unsupported file format. Please upload a CSV or Excel file.")
-    
+
+def parse_bytes(data, file_ext, sheet_name=0, encoding=None, workbook=None):
+    if file_ext == "csv":
+        # The encoding is checked over the bytes up front (latin1 for legacy Excel-exported
+        # CSVs), so a non-UTF-8 file is parsed once rather than failing and being re-read
+        return pd.read_csv(io.BytesIO(data), encoding=encoding or detect_encoding(data))
+
+    elif file_ext in ["xls", "xlsx"]:
+        # An open pd.ExcelFile lets several sheets share one pass over the workbook
+        source = io.BytesIO(data) if workbook is None else workbook
+        return pd.read_excel(source, sheet_name=sheet_name)  # Reads first sheet by default
+
+    elif file_ext == "parquet":
+        return pd.read_parquet(io.BytesIO(data))
+
+    elif file_ext == "feather":
+        return pd.read_feather(io.BytesIO(data))
+
+    else:
+        raise ValueError("Unsupported file format. Please upload a CSV, Excel, Parquet or Feather file.")
+
+
+def parse_with_sidecar(data, key, workbook=None):
+    _, file_ext, sheet_name, encoding = key
+    # Columnar uploads are already cheap to load; only text and Excel get an Arrow copy
+    if file_ext in ["parquet", "feather"]:
+        return parse_bytes(data, file_ext, sheet_name, encoding)
+
+    df = load_sidecar(key)
+    if df is None:
+        df = parse_bytes(data, file_ext, sheet_name, encoding, workbook)
+        save_sidecar(key, df)
+    return df
+
+
+def read_cached(data, digest, file_ext, sheet_name=0, encoding=None, workbook=None):
+    key = (digest, file_ext, sheet_name, encoding)
+    try:
+        with stage(f"read_file ({file_ext})"):
+            return parse_cache.get_or_compute(key, lambda: parse_with_sidecar(data, key, workbook))
     except Exception as e:
         raise RuntimeError(f"File reading failed: {e}")
+
+
+def read_file(file, sheet_name=0, encoding=None):
+    file_ext = file.name.split('.')[-1].lower()
+    data = file_bytes(file)
+    # Hand out a private copy so callers can't alter the cached frame
+    return read_cached(data, content_hash(data), file_ext, sheet_name, encoding).copy()
+
+
+def stream_with_sidecar(data, digest, dtypes, prepare_chunk):
+    """
+    stream_chunks, with an Arrow sidecar of the prepared chunks: streamed CSVs never
+    build the parsed frame read_cached keeps a copy of, so the sidecar holds the
+    result instead. Returns (prepared chunks concatenated, raw bytes read).
+    """
+    key = (digest, "csv", "streamed", prepare_chunk.__name__)
+    df = load_sidecar(key)
+    if df is None:
+        df, raw_bytes = stream_chunks(data, dtypes, prepare_chunk)
+        df.attrs["raw_bytes"] = raw_bytes
+        save_sidecar(key, df)
+    return df, df.attrs.pop("raw_bytes", frame_bytes(df))
+
+
+def build_prepared(data, digest, file_ext, prepare):
+    if file_ext == "csv" and prepare in CSV_STREAMS and len(data) >= stream_threshold_bytes():
+        # Large CSVs are parsed and prepared chunk by chunk, without a raw full-file frame
+        dtypes, prepare_chunk, finish = CSV_STREAMS[prepare]
+        try:
+            with stage("read_file (csv, streamed)"):
+                return finish(*stream_with_sidecar(data, digest, dtypes, prepare_chunk))
+        except pd.errors.ParserError as e:
+            raise RuntimeError(f"File reading failed: {e}")
+    return prepare(read_cached(data, digest, file_ext))
+
+
+def load_prepared(file, prepare):
+    file_ext = file.name.split('.')[-1].lower()
+    data = file_bytes(file)
+    digest = content_hash(data)
+    df = prepared_cache.get_or_compute(
+        (digest, prepare.__name__),
+        lambda: tag_frame(build_prepared(data, digest, file_ext, prepare), digest)
+    )
+    # The cached frame is canonical and shared by every tab and session: callers get a
+    # shallow copy, and copy-on-write keeps any local edits from reaching the cache
+    return df.copy(deep=False)
+
+
+def ingest_workers():
+    try:
+        return max(int(os.environ.get("AOP_INGEST_WORKERS", os.cpu_count() or 1)), 1)
+    except ValueError:
+        return os.cpu_count() or 1
+
+
+def ingest_executor(n_sources):
+    """
+    Pool for parsing several sources at once. Threads (the default) suit CSV and
+    columnar files; AOP_INGEST_POOL=process spreads pure-Python Excel parsing over
+    cores, at the cost of starting fresh worker processes.
+    """
+    workers = min(ingest_workers(), n_sources)
+    if os.environ.get("AOP_INGEST_POOL", "thread") == "process":
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    return ThreadPoolExecutor(workers)
+
+
+def prepare_source(label, read, prepare_chunk):
+    """(label, prepared chunk, raw bytes, None), or (label, None, 0, error) when it fails."""
+    try:
+        raw = read()
+        # Shallow copy: the chunk step renames columns, which must not reach the cached parse
+        return label, prepare_chunk(raw.copy(deep=False)), frame_bytes(raw), None
+    except Exception as e:
+        return label, None, 0, str(e)
+
+
+def prepare_upload(name, file_ext, data, digest, prepare):
+    """
+    One uploaded file's sources, as prepare_source results: each sheet of a workbook,
+    read from a single open ExcelFile, or the whole file. CSVs of AOP_CSV_STREAM_MB or
+    more are streamed chunk by chunk, as single uploads are.
+    """
+    dtypes, prepare_chunk, _ = CSV_STREAMS[prepare]
+    if file_ext in ["xls", "xlsx"]:
+        try:
+            workbook = pd.ExcelFile(io.BytesIO(data))
+        except Exception as e:
+            return [(name, None, 0, str(e))]
+        with workbook:
+            return [
+                prepare_source(
+                    f"{name} / {sheet}",
+                    lambda: read_cached(data, digest, file_ext, sheet, workbook=workbook),
+                    prepare_chunk,
+                )
+                for sheet in workbook.sheet_names
+            ]
+    if file_ext == "csv" and len(data) >= stream_threshold_bytes():
+        try:
+            with stage("read_file (csv, streamed)"):
+                chunk, raw_bytes = stream_with_sidecar(data, digest, dtypes, prepare_chunk)
+        except Exception as e:
+            return [(name, None, 0, str(e))]
+        return [(name, chunk, raw_bytes, None)]
+    return [prepare_source(name, lambda: read_cached(data, digest, file_ext), prepare_chunk)]
+
+
+def prepare_sources(uploads, prepare):
+    """
+    Parses and prepares every file, and every sheet of each workbook, in a pool with one
+    task per file, then concatenates the results into one canonical frame. A source that
+    fails is left out and listed in df.attrs["source_errors"]; only if all fail is the
+    first error raised.
+    """
+    _, _, finish = CSV_STREAMS[prepare]
+    chunks, raw_bytes, errors = [], 0, []
+    # Each file's bytes go to one task, so a process pool pickles a workbook once, not per sheet
+    with ingest_executor(len(uploads)) as pool:
+        futures = [pool.submit(prepare_upload, *upload, prepare) for upload in uploads]
+        for (name, *_), future in zip(uploads, futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [(name, None, 0, str(e))]
+            for label, chunk, chunk_bytes, error in results:
+                if error is not None:
+                    errors.append((label, error))
+                    continue
+                chunks.append(chunk)
+                raw_bytes += chunk_bytes
+
+    if not chunks:
+        raise ValueError(f"{errors[0][0]}: {errors[0][1]}")
+    df = finish(concat_chunks(chunks), raw_bytes)
+    df.attrs["source_errors"] = errors
+    return df
+
+
+def load_sources(files, prepare):
+    """
+    Canonical frame from one or more uploaded files. A single CSV/Parquet/Feather
+    file takes the load_prepared path; several files or any workbook go through
+    prepare_sources, cached on the digests of all the files.
+    """
+    files = files if isinstance(files, list) else [files]
+    if len(files) == 1 and files[0].name.split('.')[-1].lower() not in ["xls", "xlsx"]:
+        return load_prepared(files[0], prepare)
+
+    uploads = []
+    for file in files:
+        data = file_bytes(file)
+        uploads.append((file.name, file.name.split('.')[-1].lower(), data, content_hash(data)))
+    digests = tuple(digest for *_, digest in uploads)
+    df = prepared_cache.get_or_compute(
+        (digests, prepare.__name__),
+        lambda: tag_frame(prepare_sources(uploads, prepare), content_hash("|".join(digests).encode()))
+    )
+    return df.copy(deep=False)
+
+
+def load_target(files):
+    return load_sources(files, prepare_target)
+
+
+def load_expense(files):
+    return load_sources(files, prepare_expense)
+
+
+def load_paths(target_paths, expense_paths):
+    """Canonical (target, expense) frames from files on disk, through the same caches as uploads."""
+    files = [open(path, "rb") for path in target_paths + expense_paths]
+    try:
+        return load_target(files[:len(target_paths)]), load_expense(files[len(target_paths):])
+    finally:
+        for f in files:
+            f.close()
@@ -0,0 +1,188 @@
+import re
+import numpy as np
+import pandas as pd
+from utils.helper import parse_month_year, valid_months
+from utils.diagnostics import stage
+
+TARGET_RENAMES = {
+    "sales value target": "sales target",
+    "actual sales value": "sales achieved",
+    "target sales unit": "unit target",
+    "actual sales unit": "unit achieved",
+}
+
+TARGET_NUM_COLS = [
+    "sales target", "sales achieved",
+    "unit target", "unit achieved",
+    "collection target", "collection achieved",
+    "dm inflow actual", "dm inflow target"
+]
+
+TARGET_REQUIRED_COLS = ["project", "monthstart"] + TARGET_NUM_COLS
+
+EXPENSE_REQUIRED_COLS = ["expense", "expense category", "month", "year", "actual", "target"]
+
+TARGET_UNIT_COLS = ["unit target", "unit achieved"]
+
+# Column types for reading CSV uploads, keyed by canonical column name
+TARGET_CSV_DTYPES = {"project": "str", "month": "str", "year": "float64", **{col: "float64" for col in TARGET_NUM_COLS}}
+EXPENSE_CSV_DTYPES = {
+    "expense": "str", "expense category": "str", "month": "str",
+    "year": "float64", "actual": "float64", "target": "float64",
+}
+
+# Largest round-trip error accepted when storing an amount column as float32; well under
+# the half cent at which the 2-decimal tables would start to round differently
+FLOAT32_TOLERANCE = 1e-3
+
+
+def normalize_columns(df):
+    df.columns = df.columns.str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+    return df
+
+
+def column_key(name):
+    """The canonical name normalize_columns (plus TARGET_RENAMES) gives a raw header."""
+    name = re.sub(r'\s+', ' ', str(name).strip().lower())
+    return TARGET_RENAMES.get(name, name)
+
+
+def add_monthstart(df):
+    if 'month' not in df.columns or 'year' not in df.columns:
+        raise ValueError("❌ CSV must include 'month' and 'year' columns to compute 'monthstart'.")
+
+    # Normalize 'month' values, check for typos and build 'monthstart' in one pass
+    month_names, monthstart, invalid_months = parse_month_year(df['month'], df['year'])
+    if invalid_months:
+        raise ValueError(f"⚠️ The following month values are invalid: {', '.join(map(str, invalid_months))}")
+
+    df['month'] = month_names
+    df['year'] = pd.to_numeric(df['year'], errors='coerce')
+    df['monthstart'] = monthstart
+    return df
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def clean_labels(series):
+    """
+    Strips and title-cases labels once per distinct value and returns them as a
+    categorical column; non-string labels become NaN like `.str` would make them.
+    """
+    codes, uniques = pd.factorize(series)
+    labels = pd.Series(uniques, dtype=object).str.strip().str.title()
+    values = np.append(labels.to_numpy(dtype=object), np.nan)[codes]
+    return pd.Series(pd.Categorical(values), index=series.index)
+
+
+def downcast_amounts(series):
+    """
+    Returns the column as float32 when it holds at most two decimals and every value
+    survives the round trip within FLOAT32_TOLERANCE. Columns with finer values (e.g.
+    3-decimal DM inflows) stay float64 so no displayed figure can shift.
+    """
+    values = series.to_numpy(dtype="float64")
+    values = values[~np.isnan(values)]
+    if len(values) == 0 or not np.allclose(np.round(values, 2), values, rtol=0, atol=1e-9):
+        return series
+    as_float32 = values.astype("float32")
+    if np.abs(as_float32.astype("float64") - values).max() <= FLOAT32_TOLERANCE:
+        return series.astype("float32")
+    return series
+
+
+def downcast_units(series):
+    values = series.to_numpy(dtype="float64")
+    if not np.isnan(values).any() and (values == np.floor(values)).all():
+        return pd.to_numeric(series, downcast="integer")
+    return downcast_amounts(series)
+
+
+def compact_dtypes(df, label_cols, unit_cols, amount_cols, raw_bytes):
+    """
+    Stores dimensions as categoricals, whole-number units as the smallest integer type
+    and amounts as float32 when that keeps every value within FLOAT32_TOLERANCE.
+    The memory before (raw upload) and after is kept in df.attrs["memory_bytes"].
+    """
+    for col in label_cols:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    df['month'] = pd.Categorical(df['month'], categories=valid_months)
+    df['year'] = pd.to_numeric(df['year'], downcast="integer")
+    for col in unit_cols:
+        df[col] = downcast_units(df[col])
+    for col in amount_cols:
+        df[col] = downcast_amounts(df[col])
+    df.attrs["memory_bytes"] = {"before": raw_bytes, "after": frame_bytes(df)}
+    return df
+
+
+def prepare_target_chunk(df):
+    """
+    The row-by-row part of prepare_target, also applied to each chunk of a streamed
+    CSV: normalised column names, a validated 'monthstart' and numeric metric columns.
+    """
+    with stage("normalize columns (target)"):
+        df = normalize_columns(df)
+    with stage("monthstart parsing (target)"):
+        df = add_monthstart(df)
+    if df['monthstart'].isna().any():
+        raise ValueError("⚠️ Some rows have invalid month/year combinations. Please check the 'month' and 'year' columns.")
+
+    df = df.rename(columns=TARGET_RENAMES)
+    missing = [col for col in TARGET_REQUIRED_COLS if col not in df.columns]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+
+    df[TARGET_NUM_COLS] = df[TARGET_NUM_COLS].apply(pd.to_numeric, errors="coerce")
+    df['project'] = df['project'].astype("category")
+    return df
+
+
+def finish_target(df, raw_bytes):
+    with stage("compact dtypes (target)"):
+        amount_cols = [col for col in TARGET_NUM_COLS if col not in TARGET_UNIT_COLS]
+        return compact_dtypes(df, ["project"], TARGET_UNIT_COLS, amount_cols, raw_bytes)
+
+
+def prepare_target(df):
+    """
+    Builds the canonical target frame shared by both dashboards: normalised
+    column names, a validated 'monthstart' and numeric metric columns.
+    Raises ValueError with a user-facing message when the upload is unusable.
+    """
+    raw_bytes = frame_bytes(df)
+    return finish_target(prepare_target_chunk(df.copy()), raw_bytes)
+
+
+def prepare_expense_chunk(df):
+    """The row-by-row part of prepare_expense, also applied to each chunk of a streamed CSV."""
+    with stage("normalize columns (expense)"):
+        df = normalize_columns(df)
+    missing = [col for col in EXPENSE_REQUIRED_COLS if col not in df.columns]
+    if missing:
+        raise ValueError(f"CSV must contain columns: {', '.join(missing)}")
+
+    with stage("clean labels (expense)"):
+        df['target'] = pd.to_numeric(df['target'], errors='coerce')
+        df['actual'] = pd.to_numeric(df['actual'], errors='coerce')
+        df['expense category'] = clean_labels(df['expense category'])
+        df['expense'] = clean_labels(df['expense'])
+    with stage("monthstart parsing (expense)"):
+        return add_monthstart(df)
+
+
+def finish_expense(df, raw_bytes):
+    with stage("compact dtypes (expense)"):
+        return compact_dtypes(df, [], [], ["actual", "target"], raw_bytes)
+
+
+def prepare_expense(df):
+    """
+    Builds the canonical expense frame: normalised column names, title-cased
+    expense heads and categories, a 'monthstart' column and numeric amounts.
+    """
+    raw_bytes = frame_bytes(df)
+    return finish_expense(prepare_expense_chunk(df.copy()), raw_bytes)
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+from utils.cache import memoize_on_frame
+from utils.diagnostics import stage
+
+# Finest decimal place the prefix sums keep exactly
+MAX_DECIMALS = 6
+# float64 adds whole numbers exactly up to here, so the prefix sums stay exact below it
+EXACT_LIMIT = 2.0 ** 53
+
+
+def month_number(date):
+    return date.year * 12 + date.month - 1
+
+
+def decimal_places(values, eps):
+    """
+    Fewest decimals (up to MAX_DECIMALS) that hold every value, allowing for the
+    representation error `eps` of the column's dtype, capped so the column's total
+    in those units stays below EXACT_LIMIT.
+    """
+    magnitude = np.abs(values).sum()
+    for places in range(MAX_DECIMALS + 1):
+        if magnitude * 10.0 ** places >= EXACT_LIMIT:
+            return max(places - 1, 0)
+        scaled = values * 10.0 ** places
+        if np.all(np.abs(scaled - np.rint(scaled)) <= np.abs(scaled) * eps * 4 + 1e-6):
+            return places
+    return MAX_DECIMALS
+
+
+class CumulativeIndex:
+    """
+    Monthly prefix sums of `value_cols` per value of `key_col`, built in one pass.
+    The sum over any date range is the difference of two cumulative rows, so an
+    MTD/QTD/YTD lookup no longer scans the frame.
+    Ranges follow the dashboards' filters: a row counts when start <= monthstart <= end.
+    """
+
+    def __init__(self, df, value_cols, key_col=None, date_col="monthstart"):
+        self.value_cols = list(value_cols)
+        self.key_col = key_col
+
+        months = df[date_col].to_numpy(dtype="datetime64[M]")
+        valid = ~np.isnat(months)
+        months = months.astype("int64") + 1970 * 12
+        self.first_month = int(months[valid].min()) if valid.any() else 0
+        self.n_months = int(months[valid].max()) - self.first_month + 1 if valid.any() else 0
+
+        if key_col is None:
+            codes, keys = np.zeros(len(df), dtype="int64"), [None]
+        else:
+            codes, keys = pd.factorize(df[key_col], sort=True)
+        self.keys = list(keys)
+        self._positions = {key: i for i, key in enumerate(self.keys)}
+
+        # One extra channel counts rows, so empty ranges can be told apart from zero sums
+        values = np.nan_to_num(df[self.value_cols].to_numpy(dtype="float64"))
+        values = np.column_stack([values, np.ones(len(df))])
+        # Each channel is summed in whole units of its last decimal place (cents, or
+        # thousandths for 3-decimal inflows). Differences of the running totals are then
+        # exact, and dividing by the unit gives the same float as the decimal sum itself.
+        # Running float totals would shift half-cent ties in the 2-decimal tables.
+        eps = [np.finfo(df[col].dtype).eps if df[col].dtype.kind == "f" else np.finfo("float64").eps for col in self.value_cols]
+        self.units = 10.0 ** np.array([decimal_places(values[:, c], e) for c, e in enumerate(eps)] + [0])
+        values = np.rint(values * self.units)
+
+        width = self.n_months + 1
+        slots = (months - self.first_month + 1)[valid]
+        keyed = codes[valid] >= 0
+        flat = codes[valid][keyed] * width + slots[keyed]
+        n_channels = values.shape[1]
+
+        self.cumulative = np.empty((len(self.keys), width, n_channels))
+        self.total_cumulative = np.empty((width, n_channels))
+        for c in range(n_channels):
+            channel = values[valid, c]
+            self.cumulative[:, :, c] = np.bincount(
+                flat, weights=channel[keyed], minlength=len(self.keys) * width
+            ).reshape(len(self.keys), width)
+            # Totals include rows whose key is missing, like a plain df.sum() would
+            self.total_cumulative[:, c] = np.bincount(slots, weights=channel, minlength=width)
+        np.cumsum(self.cumulative, axis=1, out=self.cumulative)
+        np.cumsum(self.total_cumulative, axis=0, out=self.total_cumulative)
+
+    @property
+    def nbytes(self):
+        return self.cumulative.nbytes + self.total_cumulative.nbytes
+
+    def _bounds(self, start, end):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        # The first month counts only if its first day is on or after `start`
+        lo = month_number(start) + (start != pd.Timestamp(start.year, start.month, 1))
+        hi = month_number(end) + 1
+        lo = min(max(lo - self.first_month, 0), self.n_months)
+        hi = min(max(hi - self.first_month, 0), self.n_months)
+        return lo, max(hi, lo)
+
+    def to_values(self, sums):
+        """Sums held in whole units (any shape, channels last) as the values they stand for."""
+        return sums / self.units
+
+    def _values(self, sums):
+        return pd.Series(self.to_values(sums)[:-1], index=self.value_cols)
+
+    def total(self, start, end):
+        lo, hi = self._bounds(start, end)
+        return self._values(self.total_cumulative[hi] - self.total_cumulative[lo])
+
+    def sum(self, start, end, key):
+        if key not in self._positions:
+            return pd.Series(0.0, index=self.value_cols)
+        lo, hi = self._bounds(start, end)
+        cumulative = self.cumulative[self._positions[key]]
+        return self._values(cumulative[hi] - cumulative[lo])
+
+    def sum_by_key(self, start, end, present_only=True):
+        """
+        Per-key sums for the range. By default only keys with at least one row in it
+        are kept (the same keys a groupby over the filtered frame would return).
+        """
+        lo, hi = self._bounds(start, end)
+        sums = self.cumulative[:, hi] - self.cumulative[:, lo]
+        present = sums[:, -1] > 0 if present_only else np.ones(len(self.keys), dtype=bool)
+        return pd.DataFrame(
+            self.to_values(sums[present])[:, :-1],
+            index=pd.Index([k for k, p in zip(self.keys, present) if p], name=self.key_col),
+            columns=self.value_cols,
+        )
+
+
+def build_period_index(df, value_cols, key_col=None, date_col="monthstart"):
+    with stage(f"period index ({key_col or 'total'})"):
+        return memoize_on_frame(
+            "period_index", df,
+            lambda df, value_cols, key_col, date_col: CumulativeIndex(df, list(value_cols), key_col, date_col),
+            tuple(value_cols), key_col, date_col
+        )
+
+
+def expense_monthly_index(expense_df):
+    # Rows without a category still count towards their expense head
+    monthly = (
+        expense_df.groupby(["expense category", "expense", "monthstart"], observed=True, dropna=False)[["actual", "target"]]
+        .sum()
+        .reset_index()
+    )
+    return CumulativeIndex(monthly, ["actual", "target"], key_col="expense")
+
+
+def build_expense_index(expense_df):
+    """
+    Per-expense-head prefix sums of actual/target, built from one
+    (category, head, month) groupby of the long-form upload.
+    """
+    with stage("expense monthly index"):
+        return memoize_on_frame("expense_index", expense_df, expense_monthly_index)
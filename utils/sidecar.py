@@ -0,0 +1,85 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from utils.cache import budget_from_env, content_hash
+
+DEFAULT_SIDECAR_DIR = Path(__file__).resolve().parent.parent / ".cache" / "uploads"
+# Part of every sidecar name; bumped when parsing changes so older copies are never reused
+# (2: CSV encoding is checked over the whole file, not a sample with bad bytes replaced)
+SIDECAR_VERSION = 2
+
+
+def sidecar_dir():
+    """
+    Directory holding Arrow IPC copies of parsed uploads, from AOP_SIDECAR_DIR.
+    Setting the variable to an empty string turns the sidecar store off.
+    """
+    path = os.environ.get("AOP_SIDECAR_DIR", str(DEFAULT_SIDECAR_DIR))
+    return Path(path) if path else None
+
+
+def sidecar_path(key):
+    digest, *options = key
+    folder = sidecar_dir()
+    if folder is None:
+        return None
+    return folder / f"{digest}-{content_hash(repr([SIDECAR_VERSION] + options).encode())[:12]}.arrow"
+
+
+def load_sidecar(key):
+    path = sidecar_path(key)
+    if path is None or not path.exists():
+        return None
+    try:
+        # Uncompressed IPC files are memory-mapped, so reloads skip the original parser entirely
+        df = feather.read_table(path, memory_map=True).to_pandas()
+    except (OSError, pa.ArrowException):
+        return None
+    try:
+        os.utime(path)  # Keeps mtime as a last-used stamp for pruning
+    except OSError:
+        pass  # Pruned by another session meanwhile; the frame is already loaded
+    return df
+
+
+def save_sidecar(key, df):
+    path = sidecar_path(key)
+    if path is None:
+        return
+    tmp = None
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so a concurrent reader never sees half a file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+        tmp = None
+        prune_sidecars(path.parent)
+    except (OSError, pa.ArrowException, ValueError, TypeError):
+        # Frames Arrow can't represent (mixed-type object columns, non-string headers)
+        # simply stay parse-only; the sidecar is a copy, so failing to write or prune is harmless
+        if tmp is not None:
+            Path(tmp).unlink(missing_ok=True)
+
+
+def prune_sidecars(folder):
+    """Deletes the least recently used sidecars beyond AOP_SIDECAR_MAX_MB; files other sessions remove meanwhile are skipped."""
+    max_bytes = budget_from_env("AOP_SIDECAR_MAX_MB", 2048)
+    files = []
+    for path in folder.glob("*.arrow"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    used = 0
+    for _, size, path in sorted(files, key=lambda f: f[0], reverse=True):
+        used += size
+        if used > max_bytes:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from utils.cache import memoize_on_frame
+from utils.diagnostics import stage
+from utils.normalize import TARGET_NUM_COLS
+
+ALL_PROJECTS = "All Projects"
+
+
+def summarise_projects(target_df):
+    # float32 amounts are summed in float64: all-project totals pass 2**24, where float32
+    # drops cents. Integer unit columns stay integers, as the monthly tables show them.
+    values = target_df[TARGET_NUM_COLS]
+    values = values.astype({col: "float64" for col in TARGET_NUM_COLS if values[col].dtype == np.float32})
+    grouped = values.groupby([target_df["project"], target_df["monthstart"]], observed=True).sum()
+    cube = {
+        project: monthly.droplevel("project")
+        for project, monthly in grouped.groupby(level="project", observed=True)
+    }
+    cube[ALL_PROJECTS] = grouped.groupby(level="monthstart").sum()
+    return cube
+
+
+def build_summary_cube(target_df):
+    """
+    Monthly target/achieved totals for every metric and project from a single
+    groupby over (project, monthstart), plus an "All Projects" rollup.
+    Returns {project: frame indexed by monthstart}; built once per upload.
+    """
+    with stage("monthly summary cube"):
+        return memoize_on_frame("summary_cube", target_df, summarise_projects)